@@ -0,0 +1,35 @@
+from hashlib import sha256
+
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_CACHE_ALIAS = 'tokens'
+
+
+def get_token_cache_key(key):
+    return f'auth-token:{sha256(key.encode()).hexdigest()}'
+
+
+def forget_tokens(*keys):
+    """ Удаление токенов из кэша при выходе или изменении пользователя. """
+    caches[TOKEN_CACHE_ALIAS].delete_many(
+        [get_token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Токен-аутентификация с кэшем token → user.
+
+    Пара (пользователь, токен) хранится в кэше tokens с ограниченным
+    временем жизни; запись удаляется сигналами при удалении токена
+    (выход через djoser) и при сохранении пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = caches[TOKEN_CACHE_ALIAS]
+        cache_key = get_token_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials)
+        return credentials
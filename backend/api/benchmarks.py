@@ -0,0 +1,151 @@
+import re
+from collections import Counter
+from itertools import islice
+from random import Random
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+
+BENCH_PREFIX = 'bench'
+BENCH_PASSWORD = 'bench-password'
+BENCH_IMAGE = 'recipes/image/bench_detail.jpg'
+BENCH_RANDOM_SEED = 2023
+WRITE_PATTERN = re.compile(
+    r'^(INSERT|UPDATE|DELETE)(?: OR \w+)?(?: INTO| FROM)? (\S+)')
+LINK_TABLES = ('recipes_ingredientrecipe', 'recipes_recipe_tags')
+
+
+def measure(func, repeat):
+    """ Время выполнения функции в микросекундах: mean, p50, p95. """
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        timings.append((perf_counter() - started) * 1_000_000)
+    percentiles = quantiles(timings, n=100) if len(timings) > 1 else timings
+    return {
+        'mean': mean(timings),
+        'p50': percentiles[49] if len(timings) > 1 else timings[0],
+        'p95': percentiles[94] if len(timings) > 1 else timings[0],
+    }
+
+
+def count_writes(queries):
+    """ Число INSERT/UPDATE/DELETE по таблицам. """
+    writes = Counter()
+    for query in queries:
+        match = WRITE_PATTERN.match(query['sql'].replace('"', ''))
+        if match:
+            writes[' '.join(match.groups())] += 1
+    return writes
+
+
+def format_timings(title, timings):
+    return (f'{title:<24} mean {timings["mean"]:>10.1f} мкс   '
+            f'p50 {timings["p50"]:>10.1f} мкс   '
+            f'p95 {timings["p95"]:>10.1f} мкс')
+
+
+def seed_database(users, recipes, follows, favorites, cart,
+                  ingredients_per_recipe, batch_size=5000, stdout=None):
+    """
+    Наполнение базы синтетическими данными для замеров.
+
+    Пользователи создаются с префиксом bench, записи пишутся пакетами
+    через bulk_create; счётчики, поисковый индекс, списки покупок,
+    ленты и рейтинги пересобираются в конце.
+    """
+    from recipes.counters import recount_all
+    from recipes.feed import rebuild_feeds
+    from recipes.scores import create_missing_scores, update_dirty_scores
+    from recipes.search import update_search_index
+    from recipes.shopping_list import rebuild_shopping_lists
+    from recipes.models import (Favorite, Ingredient, IngredientRecipe,
+                                Recipe, ShoppingCart, Tag)
+    from users.models import Follow, User
+
+    random = Random(BENCH_RANDOM_SEED)
+    log = stdout.write if stdout else (lambda message: None)
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    if not ingredient_ids:
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'{BENCH_PREFIX}-{number}', measurement_unit='г')
+            for number in range(500)
+        )
+        ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True))
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    if not tag_ids:
+        Tag.objects.bulk_create(
+            Tag(name=f'{BENCH_PREFIX}-{number}',
+                slug=f'{BENCH_PREFIX}-{number}', color=f'#{number:06x}')
+            for number in range(3)
+        )
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+
+    log(f'Пользователи: {users}')
+    password = make_password(BENCH_PASSWORD)
+    start = User.objects.filter(username__startswith=BENCH_PREFIX).count()
+    bulk_create(User, (
+        User(username=f'{BENCH_PREFIX}{number}',
+             email=f'{BENCH_PREFIX}{number}@example.com',
+             first_name='Бенч', last_name=str(number), password=password)
+        for number in range(start, start + users)
+    ), batch_size)
+    user_ids = list(User.objects.filter(
+        username__startswith=BENCH_PREFIX).values_list('id', flat=True))
+
+    log(f'Рецепты: {recipes}')
+    bulk_create(Recipe, (
+        Recipe(author_id=random.choice(user_ids), name=f'Рецепт {number}',
+               text=f'Описание рецепта {number}', image=BENCH_IMAGE,
+               cooking_time=random.randint(1, 180))
+        for number in range(recipes)
+    ), batch_size)
+    recipe_ids = list(Recipe.objects.filter(
+        author_id__in=user_ids).values_list('id', flat=True))
+
+    log('Ингредиенты и теги рецептов')
+    bulk_create(IngredientRecipe, (
+        IngredientRecipe(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                         amount=random.randint(1, 500))
+        for recipe_id in recipe_ids
+        for ingredient_id in random.sample(
+            ingredient_ids, min(ingredients_per_recipe, len(ingredient_ids)))
+    ), batch_size)
+    bulk_create(Recipe.tags.through, (
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in random.sample(tag_ids, random.randint(1, len(tag_ids)))
+    ), batch_size)
+
+    log('Подписки, избранное и корзины')
+    bulk_create(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in random.sample(user_ids, min(follows, len(user_ids)))
+        if author_id != user_id
+    ), batch_size)
+    for model, per_user in ((Favorite, favorites), (ShoppingCart, cart)):
+        bulk_create(model, (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in random.sample(
+                recipe_ids, min(per_user, len(recipe_ids)))
+        ), batch_size)
+    recount_all()
+
+    log('Поисковый индекс, списки покупок, ленты и рейтинги')
+    for start in range(0, len(recipe_ids), batch_size):
+        update_search_index(recipe_ids[start:start + batch_size])
+    rebuild_shopping_lists(user_ids)
+    rebuild_feeds(user_ids)
+    create_missing_scores()
+    update_dirty_scores(batch_size)
+
+
+def bulk_create(model, objects, batch_size):
+    objects = iter(objects)
+    while batch := list(islice(objects, batch_size)):
+        model.objects.bulk_create(batch, ignore_conflicts=True)
@@ -0,0 +1,112 @@
+from hashlib import sha1
+from time import monotonic, time
+
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from common.constants import CATALOG_CACHE_TIMEOUT
+from recipes.models import Tag
+
+
+class VersionCounter:
+    """
+    Счётчик версии данных в общем кэше Django.
+
+    Начальное значение берётся из текущего времени, поэтому после
+    вытеснения ключа из кэша версия не повторит уже выданную.
+    """
+
+    def __init__(self, key):
+        self.key = key
+
+    def get(self):
+        version = cache.get(self.key)
+        if version is None:
+            cache.add(self.key, int(time() * 1000), timeout=None)
+            version = cache.get(self.key)
+        return version
+
+    def bump(self):
+        try:
+            return cache.incr(self.key)
+        except ValueError:
+            return self.get()
+
+
+catalog_version = VersionCounter('catalog-version')
+
+
+class CatalogCache:
+    """
+    Справочники (теги, ингредиенты), отрендеренные в JSON.
+
+    Байты ответа и их ETag хранятся в памяти процесса и
+    пересобираются при смене версии каталога или по истечении
+    CATALOG_CACHE_TIMEOUT секунд.
+    """
+
+    def __init__(self, version_counter):
+        self.version_counter = version_counter
+        self._payloads = {}
+
+    def get(self, name, get_data):
+        version = self.version_counter.get()
+        cached = self._payloads.get(name)
+        if (cached is None or cached['version'] != version
+                or monotonic() - cached['built_at'] > CATALOG_CACHE_TIMEOUT):
+            content = JSONRenderer().render(get_data())
+            cached = {
+                'version': version,
+                'built_at': monotonic(),
+                'content': content,
+                'etag': f'"{sha1(content).hexdigest()}"',
+            }
+            self._payloads[name] = cached
+        return cached['content'], cached['etag']
+
+
+catalog_cache = CatalogCache(catalog_version)
+
+
+class TagCatalog:
+    """
+    Теги в памяти процесса: словари для выдачи по id и slug → id.
+
+    Как и CatalogCache, перечитывается при смене версии каталога или
+    по истечении CATALOG_CACHE_TIMEOUT секунд, а также когда
+    запрошен id тега, которого ещё нет в памяти.
+    """
+    fields = ('id', 'name', 'color', 'slug')
+
+    def __init__(self, version_counter):
+        self.version_counter = version_counter
+        self._tags = {}
+        self._ids = {}
+        self._version = None
+        self._built_at = None
+
+    def refresh(self, force=False):
+        version = self.version_counter.get()
+        if (force or self._version != version
+                or monotonic() - self._built_at > CATALOG_CACHE_TIMEOUT):
+            self._tags = {
+                tag['id']: tag for tag in Tag.objects.values(*self.fields)}
+            self._ids = {tag['slug']: tag['id'] for tag in self._tags.values()}
+            self._version = version
+            self._built_at = monotonic()
+
+    def get_ids(self, slugs):
+        """ id тегов по slug; неизвестные slug пропускаются. """
+        self.refresh()
+        return {self._ids[slug] for slug in slugs if slug in self._ids}
+
+    def get_tags(self, tag_ids):
+        """ Словари тегов по id; удалённые теги пропускаются. """
+        self.refresh(force=not set(tag_ids) <= self._tags.keys())
+        return {
+            tag_id: self._tags[tag_id] for tag_id in tag_ids
+            if tag_id in self._tags
+        }
+
+
+tag_catalog = TagCatalog(catalog_version)
@@ -0,0 +1,110 @@
+from hashlib import sha1
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .cache import VersionCounter
+
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+PAGE_ROW_FIELDS = ('id', 'updated_at', 'is_favorited', 'is_in_shopping_cart',
+                   'author_is_subscribed')
+
+
+def get_relations_version(user_id):
+    """ Версия избранного, корзины и подписок пользователя. """
+    return VersionCounter(f'user-relations:{user_id}')
+
+
+class ConditionalGetMixin:
+    """
+    ETag и Last-Modified для list/retrieve рецептов.
+
+    Валидаторы рецепта считаются до сериализации по его updated_at.
+    ETag списка собирается после выборки страницы из того, что уже
+    прочитано: id, updated_at и флагов рецептов страницы и полей
+    пагинации, поэтому выдача не платит за агрегат по всей выборке,
+    а 304 экономит рендер и передачу тела. Last-Modified у списка
+    нет: удаление рецепта со страницы не меняет max(updated_at).
+    Для авторизованных в ETag входит версия их избранного, корзины
+    и подписок, а Last-Modified не отдаётся, так как эти связи
+    не меняют updated_at.
+    """
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        if response.has_header('ETag'):
+            validators = {'etag': response['ETag'], 'last_modified': None}
+        else:
+            validators = self.get_list_validators(response)
+            if validators is None:
+                return response
+            self.set_validators(response, validators)
+        return self.get_not_modified(request, validators) or response
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = None
+        if any(header in request.META for header in CONDITIONAL_HEADERS):
+            validators = self.get_detail_validators()
+            if validators is not None:
+                response = self.get_not_modified(request, validators)
+                if response is not None:
+                    return response
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == 200 and not response.has_header('ETag'):
+            validators = validators or self.get_detail_validators()
+            if validators is not None:
+                self.set_validators(response, validators)
+        return response
+
+    def get_list_validators(self, response):
+        rows = getattr(self, 'page_rows', None)
+        if rows is None or not isinstance(response.data, dict):
+            return None
+        pagination = sorted(
+            (name, value) for name, value in response.data.items()
+            if name != 'results')
+        return self.make_validators(None, pagination, [
+            tuple(row[field] for field in PAGE_ROW_FIELDS) for row in rows])
+
+    def get_detail_validators(self):
+        recipe_id = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            updated_at = self.get_queryset().model.objects.filter(
+                pk=recipe_id).values_list('updated_at', flat=True).first()
+        except (ValueError, ValidationError):
+            return None
+        if updated_at is None:
+            return None
+        return self.make_validators(updated_at, recipe_id)
+
+    def make_validators(self, updated_at, *parts):
+        user = self.request.user
+        if user.is_authenticated:
+            parts += (user.pk, get_relations_version(user.pk).get())
+        parts += (self.request.accepted_renderer.format,
+                  updated_at and updated_at.isoformat())
+        validators = {
+            'etag': '"{}"'.format(
+                sha1(':'.join(map(str, parts)).encode()).hexdigest()),
+            'last_modified': None,
+        }
+        if updated_at is not None and not user.is_authenticated:
+            validators['last_modified'] = int(updated_at.timestamp())
+        return validators
+
+    @staticmethod
+    def set_validators(response, validators):
+        response['ETag'] = validators['etag']
+        if validators['last_modified'] is not None:
+            response['Last-Modified'] = http_date(
+                validators['last_modified'])
+        patch_vary_headers(response, ('Authorization', ))
+
+    def get_not_modified(self, request, validators):
+        response = get_conditional_response(request, **validators)
+        if response is not None:
+            self.set_validators(response, validators)
+        return response
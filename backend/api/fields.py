@@ -0,0 +1,55 @@
+from hashlib import sha256
+
+from django.core.exceptions import ValidationError
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from common.constants import IMAGE_MAX_SIDE, IMAGE_MAX_SIZE
+
+
+class RecipeImageUploadField(Base64ImageField):
+    """
+    Загрузка изображения рецепта в base64.
+
+    Проверяет размер файла и изображения до сохранения и называет
+    файл по хэшу содержимого. Уменьшенные версии готовит
+    recipes.images после сохранения рецепта.
+    """
+
+    def get_file_name(self, decoded_file):
+        if len(decoded_file) > IMAGE_MAX_SIZE:
+            raise ValidationError(
+                f'Размер изображения больше '
+                f'{IMAGE_MAX_SIZE // (1024 * 1024)} МБ')
+        return sha256(decoded_file).hexdigest()[:32]
+
+    def to_internal_value(self, data):
+        image = super().to_internal_value(data)
+        if image is not None:
+            width, height = image.image.size
+            if max(width, height) > IMAGE_MAX_SIDE:
+                raise ValidationError(
+                    f'Сторона изображения больше {IMAGE_MAX_SIDE} px')
+        return image
+
+
+class RecipeImageField(serializers.ImageField):
+    """
+    Ссылка на изображение рецепта.
+
+    Отдаёт миниатюру для карточек, если она уже готова: всегда при
+    thumbnail=True, иначе по флагу thumbnails в контексте.
+    """
+
+    def __init__(self, thumbnail=None, **kwargs):
+        self.thumbnail = thumbnail
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        thumbnail = self.thumbnail
+        if thumbnail is None:
+            thumbnail = self.context.get('thumbnails', False)
+        if thumbnail and recipe.thumbnail:
+            return super().to_representation(recipe.thumbnail)
+        return super().to_representation(recipe.image)
@@ -1,7 +1,12 @@
+from django.db.models import Count, Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Ingredient, Recipe
+from recipes.search import search_recipes
+from .cache import tag_catalog
+
+RecipeTag = Recipe.tags.through
 
 
 class IngredientFilter(SearchFilter):
@@ -13,19 +18,48 @@ class IngredientFilter(SearchFilter):
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.CharFilter(method='filter_tags')
+    tags_mode = filters.ChoiceFilter(
+        choices=(('any', 'any'), ('all', 'all')),
+        method='filter_tags_mode',
     )
     is_favorited = filters.NumberFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'popular'), ('trending', 'trending')),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',)
+        fields = ('tags', 'tags_mode', 'author', 'is_favorited',
+                  'is_in_shopping_cart', 'search', 'ordering',)
+
+    def filter_tags(self, queryset, name, value):
+        """
+        Рецепты с любым (tags_mode=any) или со всеми (all) тегами.
+
+        Проверка идёт подзапросом к таблице связей, без JOIN в
+        основном запросе, поэтому рецепты не дублируются.
+        """
+        slugs = set(self.data.getlist(name))
+        tag_ids = tag_catalog.get_ids(slugs)
+        if self.data.get('tags_mode') == 'all':
+            if len(tag_ids) < len(slugs):
+                return queryset.none()
+            return queryset.filter(pk__in=RecipeTag.objects.filter(
+                tag_id__in=tag_ids
+            ).values('recipe_id').annotate(
+                tags_count=Count('tag_id')
+            ).filter(tags_count=len(tag_ids)).values('recipe_id'))
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe_id=OuterRef('pk'), tag_id__in=tag_ids)))
+
+    def filter_tags_mode(self, queryset, name, value):
+        return queryset
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -36,3 +70,11 @@ class RecipeFilter(FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shopping_list__user=self.request.user)
         return
+
+    def filter_search(self, queryset, name, value):
+        if value.strip():
+            return search_recipes(queryset, value.strip())
+        return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(f'-score__{value}', '-pub_date', '-id')
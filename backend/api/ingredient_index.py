@@ -0,0 +1,62 @@
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+
+from common.constants import CATALOG_CACHE_TIMEOUT, INGREDIENT_SEARCH_LIMIT
+from recipes.models import Ingredient
+from .cache import catalog_version
+
+
+class IngredientIndex:
+    """
+    Префиксный индекс ингредиентов в памяти процесса.
+
+    Хранит отсортированный список названий в нижнем регистре и
+    ищет по нему бинарным поиском. Сначала выдаются совпадения по
+    началу названия, затем по вхождению подстроки. Названия и записи
+    лежат в одном кортеже, чтобы поиск не увидел половину пересборки.
+    Индекс перестраивается при смене версии каталога или по истечении
+    CATALOG_CACHE_TIMEOUT секунд, если версия в кэше процесса не видна
+    другим процессам.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._entries = ([], [])
+        self._version = None
+        self._built_at = None
+
+    def build(self):
+        version = catalog_version.get()
+        items = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda item: (item['name'].lower(), item['id'])
+        )
+        keys = [item['name'].lower() for item in items]
+        with self._lock:
+            self._entries = (keys, items)
+            self._version = version
+            self._built_at = monotonic()
+
+    def search(self, query, limit=INGREDIENT_SEARCH_LIMIT):
+        if (self._version != catalog_version.get()
+                or monotonic() - self._built_at > CATALOG_CACHE_TIMEOUT):
+            self.build()
+        keys, items = self._entries
+        query = query.strip().lower()
+        position = bisect_left(keys, query)
+        result = []
+        while (position < len(keys) and len(result) < limit
+               and keys[position].startswith(query)):
+            result.append(items[position])
+            position += 1
+        if len(result) < limit:
+            for key, item in zip(keys, items):
+                if query in key and not key.startswith(query):
+                    result.append(item)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+from rest_framework.response import Response
+
+from recipes.models import IngredientRecipe, Recipe
+from users.models import User
+from .cache import tag_catalog
+
+RecipeTag = Recipe.tags.through
+
+
+class RecipeListLeanSerializer:
+    """
+    Сериализация списка рецептов из строк values() в обычные словари.
+
+    Повторяет вывод RecipeReadSerializer байт в байт, но без
+    экземпляров моделей и полей DRF: авторы, связи с тегами и
+    ингредиенты читаются тремя запросами на страницу, словари
+    тегов берутся из tag_catalog в памяти процесса. Словари авторов
+    и тегов общие для всех рецептов страницы. Подписка на автора
+    берётся из аннотации author_is_subscribed queryset представления.
+    """
+    fields = ('id', 'name', 'image', 'thumbnail', 'text', 'cooking_time',
+              'author_id', 'pub_date', 'updated_at', 'is_favorited',
+              'is_in_shopping_cart', 'author_is_subscribed')
+    image_storage = Recipe._meta.get_field('image').storage
+
+    def __init__(self, rows, context):
+        self.rows = list(rows)
+        self.context = context
+
+    @property
+    def data(self):
+        recipe_ids = [row['id'] for row in self.rows]
+        authors = self.get_authors(self.rows)
+        tags = self.get_tags(recipe_ids)
+        ingredients = self.get_ingredients(recipe_ids)
+        return [
+            {
+                'id': row['id'],
+                'tags': tags[row['id']],
+                'author': authors[row['author_id']],
+                'ingredients': ingredients[row['id']],
+                'is_favorited': row['is_favorited'],
+                'is_in_shopping_cart': row['is_in_shopping_cart'],
+                'name': row['name'],
+                'image': self.get_image_url(row),
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+            }
+            for row in self.rows
+        ]
+
+    @staticmethod
+    def get_authors(rows):
+        subscribed = {
+            row['author_id'] for row in rows if row['author_is_subscribed']}
+        return {
+            author['id']: {
+                **author, 'is_subscribed': author['id'] in subscribed}
+            for author in User.objects.filter(
+                pk__in={row['author_id'] for row in rows}
+            ).values('email', 'id', 'username', 'first_name', 'last_name')
+        }
+
+    @staticmethod
+    def get_tags(recipe_ids):
+        links = list(RecipeTag.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag__name').values_list('recipe_id', 'tag_id'))
+        catalog = tag_catalog.get_tags({tag_id for _, tag_id in links})
+        tags = defaultdict(list)
+        for recipe_id, tag_id in links:
+            if tag_id in catalog:
+                tags[recipe_id].append(catalog[tag_id])
+        return tags
+
+    @staticmethod
+    def get_ingredients(recipe_ids):
+        ingredients = defaultdict(list)
+        for item in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('-id').values(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            ingredients[item['recipe_id']].append({
+                'id': item['ingredient_id'],
+                'name': item['ingredient__name'],
+                'measurement_unit': item['ingredient__measurement_unit'],
+                'amount': item['amount'],
+            })
+        return ingredients
+
+    def get_image_url(self, row):
+        name = row['image']
+        if self.context.get('thumbnails', False) and row['thumbnail']:
+            name = row['thumbnail']
+        if not name:
+            return None
+        url = self.image_storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class LeanListMixin:
+    """
+    Выдача списка через облегчённый сериализатор.
+
+    Страница выбирается из queryset.values() с полями сериализатора,
+    prefetch_related сбрасывается: связанные данные сериализатор
+    читает сам. Строки страницы остаются в page_rows для ETag.
+    """
+    lean_serializer_class = RecipeListLeanSerializer
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(
+            None).values(*self.lean_serializer_class.fields)
+        page = self.paginate_queryset(queryset)
+        serializer = self.lean_serializer_class(
+            page if page is not None else queryset,
+            context=self.get_serializer_context())
+        self.page_rows = serializer.rows
+        data = serializer.data
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
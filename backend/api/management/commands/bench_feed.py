@@ -0,0 +1,84 @@
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.benchmarks import (BENCH_IMAGE, BENCH_PASSWORD, BENCH_PREFIX,
+                            bulk_create, format_timings, measure)
+from api.pagination import FeedPagination
+from recipes.counters import recount_all
+from recipes.feed import get_feed_streams, rebuild_feeds
+from recipes.models import Recipe
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    ''' Лента подписок: разложенные записи против выборки по подпискам '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--follows', type=int, default=10_000)
+        parser.add_argument('--recipes-per-author', type=int, default=2)
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        user = self.seed(options)
+        page_size = options['page_size']
+        naive = Recipe.objects.filter(
+            author__following__user=user
+        ).order_by('-pub_date', '-id').values_list('pk', flat=True)
+        middle = naive[naive.count() // 2:naive.count() // 2 + 1].get()
+        recipe = Recipe.objects.get(pk=middle)
+        cursor = FeedPagination.encode_cursor(
+            [recipe.pub_date.isoformat(), recipe.pk])
+        for title, params, orm in (
+            ('Первая страница', {}, naive),
+            ('Середина ленты', {'cursor': cursor}, naive.filter(
+                pub_date__lte=recipe.pub_date).exclude(pk__gte=recipe.pk)),
+        ):
+            request = Request(APIRequestFactory().get(
+                '/', {'limit': page_size, **params}))
+            self.stdout.write(self.style.WARNING(title))
+            self.stdout.write(format_timings('Выборка по подпискам', measure(
+                lambda: list(orm[:page_size]), options['repeat'])))
+            self.stdout.write(format_timings('Лента', measure(
+                lambda: FeedPagination().paginate_streams(
+                    get_feed_streams(user), request),
+                options['repeat'])))
+
+    def seed(self, options):
+        """ Пользователь, подписанный на --follows авторов. """
+        username = f'{BENCH_PREFIX}-feed'
+        user, _ = User.objects.get_or_create(
+            username=username,
+            defaults={'email': f'{username}@example.com',
+                      'password': make_password(BENCH_PASSWORD)})
+        follows = user.follower.count()
+        if follows >= options['follows']:
+            return user
+        self.stdout.write(f'Подписки: {options["follows"]}')
+        batch_size = options['batch_size']
+        prefix = f'{BENCH_PREFIX}-feed-author'
+        bulk_create(User, (
+            User(username=f'{prefix}{number}',
+                 email=f'{prefix}{number}@example.com',
+                 password=make_password(None))
+            for number in range(options['follows'])
+        ), batch_size)
+        author_ids = list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('pk', flat=True)[:options['follows']])
+        bulk_create(Recipe, (
+            Recipe(author_id=author_id, name=f'Рецепт ленты {number}',
+                   text='Описание', image=BENCH_IMAGE, cooking_time=10)
+            for author_id in author_ids
+            for number in range(options['recipes_per_author'])
+        ), batch_size)
+        bulk_create(Follow, (
+            Follow(user=user, author_id=author_id)
+            for author_id in author_ids
+        ), batch_size)
+        recount_all()
+        rebuild_feeds([user.pk])
+        return user
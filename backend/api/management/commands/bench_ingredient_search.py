@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarks import format_timings, measure
+from api.ingredient_index import ingredient_index
+from common.constants import INGREDIENT_SEARCH_LIMIT
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    ''' Сравнение поиска ингредиентов: индекс в памяти и ORM '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument(
+            'queries', nargs='*', default=['а', 'мо', 'сыр', 'кур'])
+
+    def handle(self, *args, **options):
+        if not Ingredient.objects.exists():
+            raise CommandError('Нет ингредиентов, выполните load_data.')
+        ingredient_index.build()
+        for query in options['queries']:
+            self.stdout.write(self.style.WARNING(f'Запрос «{query}»'))
+            orm = measure(
+                lambda: list(Ingredient.objects.filter(
+                    name__istartswith=query
+                ).values('id', 'name', 'measurement_unit')),
+                options['repeat'],
+            )
+            index = measure(
+                lambda: ingredient_index.search(
+                    query, INGREDIENT_SEARCH_LIMIT),
+                options['repeat'],
+            )
+            self.stdout.write(format_timings('ORM istartswith', orm))
+            self.stdout.write(format_timings('Индекс в памяти', index))
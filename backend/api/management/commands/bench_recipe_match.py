@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, Q
+
+from api.benchmarks import format_timings, measure
+from api.recipe_matcher import recipe_matcher
+from recipes.models import Ingredient, Recipe
+
+
+class Command(BaseCommand):
+    ''' Сравнение подбора рецептов: инвертированный индекс и ORM '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=5)
+        parser.add_argument('--max-missing', type=int, default=2)
+
+    def handle(self, *args, **options):
+        ingredient_ids = list(Ingredient.objects.values_list(
+            'pk', flat=True)[:options['ingredients']])
+        if not ingredient_ids:
+            raise CommandError('Нет ингредиентов, выполните load_data.')
+        max_missing = options['max_missing']
+        recipe_matcher.build()
+        orm = measure(
+            lambda: list(Recipe.objects.annotate(
+                total=Count('ingredients', distinct=True),
+                found=Count('ingredients', distinct=True, filter=Q(
+                    ingredients__in=ingredient_ids)),
+            ).filter(
+                found__gt=0, total__lte=F('found') + max_missing
+            ).values_list('pk', 'found', 'total')),
+            options['repeat'],
+        )
+        index = measure(
+            lambda: recipe_matcher.match(ingredient_ids, max_missing),
+            options['repeat'],
+        )
+        self.stdout.write(format_timings('ORM агрегация', orm))
+        self.stdout.write(format_timings('Инвертированный индекс', index))
+        self.stdout.write(
+            'Найдено рецептов: '
+            f'{len(recipe_matcher.match(ingredient_ids, max_missing))}')
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.benchmarks import LINK_TABLES, count_writes
+from api.serializers import CreateRecipeSerializer
+from recipes.models import Ingredient, Recipe, Tag
+
+
+class Command(BaseCommand):
+    ''' Число записей в базу при редактировании рецепта '''
+
+    def handle(self, *args, **options):
+        recipe = Recipe.objects.filter(
+            ingredienttorecipe__isnull=False, tags__isnull=False
+        ).first()
+        if recipe is None:
+            raise CommandError('Нет рецептов с ингредиентами и тегами.')
+        tags = list(recipe.tags.values_list('pk', flat=True))
+        ingredients = [
+            {'id': item.ingredient_id, 'amount': item.amount}
+            for item in recipe.ingredienttorecipe.all()
+        ]
+        other_tag = Tag.objects.exclude(pk__in=tags).first()
+        other_ingredient = Ingredient.objects.exclude(
+            pk__in=[item['id'] for item in ingredients]).first()
+        scenarios = {
+            'Только описание': {'text': f'{recipe.text} '},
+            'Изменено количество': {'ingredients': [
+                {**ingredients[0], 'amount': ingredients[0]['amount'] + 1},
+                *ingredients[1:],
+            ]},
+            'Заменены тег и ингредиент': {
+                'tags': [other_tag.pk, *tags[1:]] if other_tag else tags,
+                'ingredients': [
+                    {'id': other_ingredient.pk, 'amount': 1},
+                    *ingredients[1:],
+                ],
+            },
+        }
+        for label, changes in scenarios.items():
+            writes = self.update(recipe, {
+                'tags': tags, 'ingredients': ingredients, **changes})
+            self.stdout.write(self.style.WARNING(label))
+            for statement, count in sorted(writes.items()):
+                self.stdout.write(f'    {statement:<48} {count:>3}')
+            if label == 'Только описание' and any(
+                    table in statement for statement in writes
+                    for table in LINK_TABLES):
+                raise CommandError(
+                    'Правка описания перезаписывает теги или ингредиенты.')
+        self.stdout.write(self.style.SUCCESS('Замеры завершены.'))
+
+    @staticmethod
+    def update(recipe, data):
+        """ Правка рецепта с откатом; возвращает записи по таблицам. """
+        serializer = CreateRecipeSerializer(
+            Recipe.objects.get(pk=recipe.pk), data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as context:
+                serializer.save()
+            transaction.set_rollback(True)
+        return count_writes(context.captured_queries)
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from api.benchmarks import format_timings, measure
+from common.constants import MAX_PAGE_SIZE
+from recipes.models import Recipe
+from recipes.search import search_recipes
+
+
+class Command(BaseCommand):
+    ''' Сравнение поиска рецептов: полнотекстовый индекс и ORM '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument(
+            'queries', nargs='*', default=['суп', 'курица', 'сыр томат'])
+
+    def handle(self, *args, **options):
+        if not Recipe.objects.exists():
+            raise CommandError('Нет рецептов, выполните seed или load_data.')
+        for query in options['queries']:
+            self.stdout.write(self.style.WARNING(f'Запрос «{query}»'))
+            orm = measure(
+                lambda: list(Recipe.objects.filter(
+                    Q(name__icontains=query) | Q(text__icontains=query)
+                    | Q(ingredients__name__icontains=query)
+                ).distinct().values_list('pk', flat=True)[:MAX_PAGE_SIZE]),
+                options['repeat'],
+            )
+            index = measure(
+                lambda: list(search_recipes(
+                    Recipe.objects.all(), query
+                ).values_list('pk', flat=True)[:MAX_PAGE_SIZE]),
+                options['repeat'],
+            )
+            found = search_recipes(Recipe.objects.all(), query).count()
+            self.stdout.write(format_timings('ORM icontains', orm))
+            self.stdout.write(format_timings('Поисковый индекс', index))
+            self.stdout.write(f'Найдено рецептов: {found}')
@@ -0,0 +1,76 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.benchmarks import BENCH_PREFIX, format_timings, measure
+from api.lean_serializers import RecipeListLeanSerializer
+from api.serializers import RecipeReadSerializer
+from api.views import RecipeViewSet
+from users.models import User
+
+
+class Command(BaseCommand):
+    ''' Список рецептов: облегчённая сериализация против DRF '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--pages', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            username__startswith=BENCH_PREFIX, follower__isnull=False
+        ).order_by('id').first() or User.objects.order_by('id').first()
+        renderer = JSONRenderer()
+        page_size = options['page_size']
+        for title, viewer in (('Аноним', None), ('Пользователь', user)):
+            view = self.get_view(viewer)
+            queryset = view.filter_queryset(view.get_queryset())
+            rows = queryset.prefetch_related(None).values(
+                *RecipeListLeanSerializer.fields)
+            for thumbnails in (True, False):
+                context = {**view.get_serializer_context(),
+                           'thumbnails': thumbnails}
+                for start in range(0, page_size * options['pages'],
+                                   page_size):
+                    end = start + page_size
+                    full = renderer.render(RecipeReadSerializer(
+                        queryset[start:end], many=True, context=context).data)
+                    lean = renderer.render(RecipeListLeanSerializer(
+                        rows[start:end], context=context).data)
+                    if full != lean:
+                        raise CommandError(
+                            f'{title}, thumbnails={thumbnails}: ответы '
+                            f'расходятся на рецептах {start}-{end}.')
+            context = view.get_serializer_context()
+            self.stdout.write(self.style.WARNING(
+                f'{title}: {options["pages"]} страниц по {page_size} '
+                f'совпадают байт в байт'))
+            full = measure(lambda: renderer.render(RecipeReadSerializer(
+                queryset[:page_size], many=True, context=context).data),
+                options['repeat'])
+            lean = measure(lambda: renderer.render(RecipeListLeanSerializer(
+                rows[:page_size], context=context).data), options['repeat'])
+            self.stdout.write(format_timings('RecipeReadSerializer', full))
+            self.stdout.write(format_timings('Облегчённый', lean))
+            self.stdout.write(
+                f'Рецептов в секунду: {self.throughput(full, page_size):.0f}'
+                f' против {self.throughput(lean, page_size):.0f}')
+
+    @staticmethod
+    def get_view(user):
+        """ RecipeViewSet для GET-списка от имени пользователя. """
+        request = APIRequestFactory().get('/api/recipes/')
+        if user is not None:
+            force_authenticate(request, user=user)
+        view = RecipeViewSet(action_map={'get': 'list'}, format_kwarg=None,
+                             kwargs={})
+        view.request = view.initialize_request(request)
+        if user is None:
+            view.request.user = AnonymousUser()
+        return view
+
+    @staticmethod
+    def throughput(timings, page_size):
+        return page_size / timings['mean'] * 1_000_000
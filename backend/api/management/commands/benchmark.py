@@ -0,0 +1,165 @@
+import logging
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.benchmarks import BENCH_PREFIX, measure, seed_database
+from api.urls import router
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+
+EXTRA_QUERIES = {
+    'ingredients-list': ({'name': 'а'}, ),
+    'recipes-list': (
+        {'is_favorited': 1}, {'is_in_shopping_cart': 1},
+        {'pagination': 'cursor'},
+    ),
+    'users-subscriptions': ({'recipes_limit': 3}, ),
+}
+SKIPPED_ACTIONS = ('activation', 'resend-activation', 'reset-password',
+                   'reset-password-confirm', 'reset-username',
+                   'reset-username-confirm', 'set-password', 'set-username')
+
+
+class Command(BaseCommand):
+    ''' Замеры запросов, времени и памяти для всех маршрутов API '''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', action='store_true',
+            help='Сначала наполнить базу синтетическими данными')
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument('--follows', type=int, default=50)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--cart', type=int, default=5)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--small-page', type=int, default=6)
+        parser.add_argument('--large-page', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seed_database(
+                options['users'], options['recipes'], options['follows'],
+                options['favorites'], options['cart'],
+                options['ingredients_per_recipe'], stdout=self.stdout)
+        user = User.objects.filter(
+            username__startswith=BENCH_PREFIX, follower__isnull=False
+        ).order_by('id').first()
+        if user is None:
+            raise CommandError('Нет данных для замеров, запустите с --seed.')
+        self.samples = {
+            'ingredients': Ingredient.objects.order_by('id').first().pk,
+            'tags': Tag.objects.order_by('id').first().pk,
+            'recipes': Recipe.objects.exclude(author=user).filter(
+                ingredients__isnull=False).first().pk,
+            'users': user.follower.first().author_id,
+        }
+        self.route_params = {
+            'recipes-match': {'ingredients': ','.join(
+                str(ingredient_id) for ingredient_id
+                in IngredientRecipe.objects.filter(
+                    recipe_id=self.samples['recipes']
+                ).values_list('ingredient_id', flat=True)
+            )},
+        }
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.options = options
+        logging.getLogger('foodgram.requests').setLevel(logging.ERROR)
+
+        with override_settings(ALLOWED_HOSTS=['*']):
+            failures = list(self.run_read_routes())
+            self.run_write_routes()
+        if failures:
+            raise CommandError(
+                'Число запросов зависит от размера страницы: '
+                + ', '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Замеры завершены.'))
+
+    def read_routes(self):
+        for prefix, viewset, basename in router.registry:
+            yield f'{basename}-list', reverse(f'api:{basename}-list')
+            yield f'{basename}-detail', reverse(
+                f'api:{basename}-detail', args=(self.samples[basename], ))
+            for action in viewset.get_extra_actions():
+                if (action.detail or 'get' not in action.mapping
+                        or action.url_name in SKIPPED_ACTIONS):
+                    continue
+                name = f'{basename}-{action.url_name}'
+                yield name, reverse(f'api:{name}')
+
+    def run_read_routes(self):
+        """
+        GET-маршруты с малой и большой страницей.
+
+        Обязательные параметры маршрута берутся из route_params и в
+        подпись не попадают.
+        """
+        small, large = self.options['small_page'], self.options['large_page']
+        for name, url in self.read_routes():
+            for params in ({}, *EXTRA_QUERIES.get(name, ())):
+                label = name + ''.join(
+                    f' {key}={value}' for key, value in params.items())
+                params = {**self.route_params.get(name, {}), **params}
+                queries = {
+                    limit: self.report(
+                        label if limit == small else f'{label} limit={limit}',
+                        'get', url, {**params, 'limit': limit})
+                    for limit in (small, large)
+                }
+                if queries[small] != queries[large]:
+                    self.stdout.write(self.style.ERROR(
+                        f'{label}: {queries[small]} запросов при limit={small}'
+                        f' и {queries[large]} при limit={large}'))
+                    yield label
+
+    def run_write_routes(self):
+        """ Добавление и удаление избранного, корзины и подписки. """
+        recipe = self.samples['recipes']
+        author = self.samples['users']
+        for name, url in (
+            ('recipes-favorite',
+             reverse('api:recipes-favorite', args=(recipe, ))),
+            ('recipes-shopping-cart',
+             reverse('api:recipes-shopping-cart', args=(recipe, ))),
+            ('users-subscribe',
+             reverse('api:users-subscribe', args=(author, ))),
+        ):
+            self.client.delete(url)
+            self.report(f'{name} POST+DELETE', 'toggle', url)
+
+    def request(self, method, url, data=None):
+        if method == 'toggle':
+            self.client.post(url)
+            return self.client.delete(url)
+        response = self.client.get(url, data)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def report(self, label, method, url, data=None):
+        """ Печать замеров маршрута; возвращает число SQL-запросов. """
+        self.request(method, url, data)
+        with CaptureQueriesContext(connection) as context:
+            response = self.request(method, url, data)
+        queries = len(context.captured_queries)
+        timings = measure(
+            lambda: self.request(method, url, data), self.options['repeat'])
+        tracemalloc.start()
+        self.request(method, url, data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f'{label:<56} {response.status_code:>3}  '
+            f'SQL {queries:>4}  p50 {timings["p50"] / 1000:>8.1f} мс  '
+            f'p95 {timings["p95"] / 1000:>8.1f} мс  '
+            f'память {peak / 1024:>8.0f} КБ')
+        return queries
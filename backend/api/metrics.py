@@ -0,0 +1,70 @@
+from collections import defaultdict
+from threading import Lock
+
+from django.http import HttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+METRICS_PREFIX = 'foodgram'
+
+
+class MetricsRegistry:
+    """
+    Счётчики процесса в формате Prometheus.
+
+    Значения хранятся по имени метрики и набору меток и только
+    растут; агрегирование между процессами остаётся сборщику.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._values = defaultdict(float)
+        self._help = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] += value
+
+    def get(self, name, **labels):
+        return self._values.get((name, tuple(sorted(labels.items()))), 0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = []
+        current = None
+        for (name, labels), value in values:
+            if name != current:
+                current = name
+                if name in self._help:
+                    lines.append(
+                        f'# HELP {METRICS_PREFIX}_{name} {self._help[name]}')
+                lines.append(f'# TYPE {METRICS_PREFIX}_{name} counter')
+            label_text = ','.join(
+                f'{label}="{label_value}"' for label, label_value in labels)
+            lines.append(
+                f'{METRICS_PREFIX}_{name}{{{label_text}}} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('requests_total', 'Количество запросов.')
+metrics.describe('request_seconds_total', 'Суммарное время ответа.')
+metrics.describe('db_queries_total', 'Количество SQL-запросов.')
+metrics.describe('db_seconds_total', 'Суммарное время SQL-запросов.')
+metrics.describe(
+    'app_seconds_total', 'Время представления без SQL (сериализация).')
+metrics.describe('render_seconds_total', 'Время рендеринга ответа.')
+metrics.describe('response_bytes_total', 'Суммарный размер ответов.')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """ Метрики процесса в текстовом формате Prometheus. """
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4')
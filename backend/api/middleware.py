@@ -0,0 +1,104 @@
+import logging
+from collections import Counter
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+
+from .metrics import metrics
+
+logger = logging.getLogger('foodgram.requests')
+
+
+class QueryStats:
+    """ Обёртка выполнения SQL: считает запросы и их время. """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count > 1
+        ]
+
+
+class RequestMetricsMiddleware:
+    """
+    Замер запроса: число и время SQL, время представления без SQL,
+    время рендеринга и размер ответа.
+
+    Итог отдаётся заголовком Server-Timing, копится в счётчиках для
+    /api/metrics/ и пишется в лог, если превышены пороги из
+    settings.REQUEST_METRICS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, 'REQUEST_METRICS', {})
+        self.slow_request_ms = config.get('SLOW_REQUEST_MS', 500)
+        self.max_queries = config.get('MAX_QUERIES', 30)
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request._view_finished_at = None
+        started = perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        finished = perf_counter()
+        view_finished = request._view_finished_at or finished
+        total = finished - started
+        render = finished - view_finished
+        app = max(view_finished - started - stats.duration, 0)
+        size = 0 if response.streaming else len(response.content)
+
+        match = request.resolver_match
+        labels = {
+            'view': match.view_name if match else 'unresolved',
+            'method': request.method,
+        }
+        metrics.inc('requests_total', **labels)
+        metrics.inc('request_seconds_total', total, **labels)
+        metrics.inc('db_queries_total', stats.count, **labels)
+        metrics.inc('db_seconds_total', stats.duration, **labels)
+        metrics.inc('app_seconds_total', app, **labels)
+        metrics.inc('render_seconds_total', render, **labels)
+        metrics.inc('response_bytes_total', size, **labels)
+
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+            f'app;dur={app * 1000:.1f}',
+            f'render;dur={render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        if (total * 1000 > self.slow_request_ms
+                or stats.count > self.max_queries):
+            self.log_slow_request(request, labels, total, stats, size)
+        return response
+
+    def process_template_response(self, request, response):
+        request._view_finished_at = perf_counter()
+        return response
+
+    @staticmethod
+    def log_slow_request(request, labels, total, stats, size):
+        duplicates = '\n'.join(
+            f'  {count} x {sql}' for sql, count in stats.duplicates()[:5])
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.1f мс, SQL: %d за %.1f мс, '
+            'ответ %d байт%s',
+            request.method, request.get_full_path(), labels['view'],
+            total * 1000, stats.count, stats.duration * 1000, size,
+            f'\nПовторяющиеся запросы:\n{duplicates}' if duplicates else '',
+        )
@@ -1,8 +1,218 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from heapq import merge
 
-from common.constants import MAX_PAGE
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from common.constants import MAX_PAGE, MAX_PAGE_SIZE
+
+PAGINATION_QUERY_PARAM = 'pagination'
+COUNT_QUERY_PARAM = 'count'
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор с оценкой количества строк вместо COUNT(*).
+
+    На PostgreSQL берёт оценку планировщика из EXPLAIN, на других
+    базах считает точно.
+    """
+
+    @cached_property
+    def count(self):
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return super().count
+        sql, params = self.object_list.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']['Plan Rows']
 
 
 class CustomPagination(PageNumberPagination):
     page_size = MAX_PAGE
     page_size_query_param = 'limit'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (isinstance(queryset, QuerySet) and request.query_params.get(
+                COUNT_QUERY_PARAM) == 'estimated'):
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничная выдача по ключу сортировки.
+
+    Следующая страница выбирается условием по значениям ключа
+    последней записи, без OFFSET и без подсчёта всех строк. Выборка
+    с другой явной сортировкой (поиск, рейтинг) отклоняется: курсор
+    по ordering потерял бы её порядок.
+    """
+    ordering = ('-pub_date', '-id')
+    cursor_query_param = 'cursor'
+    page_size = MAX_PAGE
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор.'
+    ordering_conflict_message = (
+        'Выдача по курсору недоступна при сортировке по релевантности '
+        'или рейтингу.')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode()))
+        except (BinasciiError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    @staticmethod
+    def encode_cursor(values):
+        return urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def get_cursor_filter(self, values):
+        """
+        Условие «строго после» для составного ключа.
+
+        Нестрогая граница по первому полю добавлена, чтобы база
+        читала индекс диапазоном, а не разворачивала OR.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = self.ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+    def get_position(self, obj):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        order_by = tuple(queryset.query.order_by)
+        if order_by != self.ordering[:len(order_by)]:
+            raise ValidationError(
+                {PAGINATION_QUERY_PARAM: self.ordering_conflict_message})
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        values = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self.get_cursor_filter(values))
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_position = (
+            self.get_position(page[-1]) if self.has_next else None)
+        return page
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class UsernameKeysetPagination(KeysetPagination):
+    ordering = ('username', 'id')
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Постраничная выдача ленты слиянием нескольких выборок.
+
+    Каждая выборка (values с pub_date и recipe_id) читается не
+    дальше одной страницы от курсора, результаты сливаются по ключу
+    сортировки без повторов.
+    """
+    ordering = ('-pub_date', '-recipe_id')
+
+    def paginate_streams(self, streams, request):
+        """ Идентификаторы рецептов страницы в порядке ленты. """
+        self.request = request
+        page_size = self.get_page_size(request)
+        values = self.decode_cursor(request)
+        condition = Q() if values is None else self.get_cursor_filter(values)
+        rows = merge(
+            *(list(stream.filter(condition).order_by(
+                *self.ordering)[:page_size + 1]) for stream in streams),
+            key=lambda row: (row['pub_date'], row['recipe_id']),
+            reverse=True,
+        )
+        page = []
+        for row in rows:
+            if page and page[-1]['recipe_id'] == row['recipe_id']:
+                continue
+            page.append(row)
+            if len(page) > page_size:
+                break
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_position = None
+        if self.has_next:
+            self.next_position = [
+                page[-1]['pub_date'].isoformat(), page[-1]['recipe_id']]
+        return [row['recipe_id'] for row in page]
+
+
+class KeysetPaginationMixin:
+    """
+    Переключение на постраничную выдачу по ключу.
+
+    Включается параметром ?pagination=cursor, без него работает
+    обычная постраничная выдача с номерами страниц.
+    """
+    keyset_pagination_class = KeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if (self.request.query_params.get(PAGINATION_QUERY_PARAM)
+                    == 'cursor'):
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
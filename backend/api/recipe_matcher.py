@@ -0,0 +1,122 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from threading import Lock
+from time import monotonic
+
+from common.constants import MATCHER_REBUILD_INTERVAL
+from recipes.models import IngredientRecipe
+from .cache import VersionCounter
+
+matcher_version = VersionCounter('recipe-matcher-version')
+
+
+def remove_sorted(values, value):
+    position = bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        del values[position]
+
+
+class RecipeMatcher:
+    """
+    Инвертированный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Для каждого ингредиента хранится отсортированный массив
+    идентификаторов рецептов, для каждого рецепта — набор его
+    ингредиентов. Изменения рецепта применяются к индексу точечно и
+    увеличивают общую версию; процессы, пропустившие изменение,
+    перестраивают индекс целиком. Версия видна другим процессам
+    только через общий кэш, поэтому индекс дополнительно
+    перестраивается раз в MATCHER_REBUILD_INTERVAL секунд.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._postings = {}
+        self._recipes = {}
+        self._version = None
+        self._built_at = None
+
+    def build(self):
+        version = matcher_version.get()
+        postings = defaultdict(lambda: array('L'))
+        recipes = defaultdict(set)
+        links = IngredientRecipe.objects.order_by(
+            'recipe_id').values_list('ingredient_id', 'recipe_id')
+        for ingredient_id, recipe_id in links.iterator():
+            if ingredient_id not in recipes[recipe_id]:
+                recipes[recipe_id].add(ingredient_id)
+                postings[ingredient_id].append(recipe_id)
+        with self._lock:
+            self._postings = dict(postings)
+            self._recipes = {
+                recipe_id: frozenset(ingredients)
+                for recipe_id, ingredients in recipes.items()
+            }
+            self._version = version
+            self._built_at = monotonic()
+
+    def ensure_fresh(self):
+        if (self._version != matcher_version.get() or monotonic()
+                - self._built_at > MATCHER_REBUILD_INTERVAL):
+            self.build()
+
+    def update_recipe(self, recipe_id, ingredient_ids=None):
+        """
+        Замена набора ингредиентов рецепта.
+
+        Без ingredient_ids набор читается из базы; пустой набор
+        удаляет рецепт из индекса.
+        """
+        if ingredient_ids is None:
+            ingredient_ids = IngredientRecipe.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('ingredient_id', flat=True)
+        ingredient_ids = frozenset(ingredient_ids)
+        with self._lock:
+            if self._version is not None:
+                previous = self._recipes.pop(recipe_id, frozenset())
+                for ingredient_id in previous - ingredient_ids:
+                    remove_sorted(self._postings[ingredient_id], recipe_id)
+                for ingredient_id in ingredient_ids - previous:
+                    insort(self._postings.setdefault(
+                        ingredient_id, array('L')), recipe_id)
+                if ingredient_ids:
+                    self._recipes[recipe_id] = ingredient_ids
+            version = matcher_version.bump()
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+            else:
+                self._version = None
+
+    def match(self, ingredient_ids, max_missing=None):
+        """
+        Рецепты, которые можно приготовить из ingredient_ids.
+
+        Возвращает кортежи (recipe_id, coverage, missing), где
+        coverage — доля ингредиентов рецепта, которые есть у
+        пользователя, missing — число недостающих. Сортировка по
+        убыванию покрытия, затем по числу недостающих.
+        """
+        self.ensure_fresh()
+        postings, recipes = self._postings, self._recipes
+        hits = Counter()
+        for ingredient_id in set(ingredient_ids):
+            hits.update(postings.get(ingredient_id, ()))
+        result = []
+        for recipe_id, found in hits.items():
+            total = len(recipes.get(recipe_id, ()))
+            if not total:
+                continue
+            missing = total - found
+            if max_missing is None or missing <= max_missing:
+                result.append((recipe_id, found / total, missing))
+        result.sort(key=lambda match: (-match[1], match[2], -match[0]))
+        return result
+
+    def missing_ingredients(self, recipe_id, ingredient_ids):
+        return sorted(
+            self._recipes.get(recipe_id, frozenset()) - set(ingredient_ids))
+
+
+recipe_matcher = RecipeMatcher()
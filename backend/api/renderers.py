@@ -0,0 +1,117 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import BaseRenderer
+
+SHOPPING_LIST_TITLE = 'Купить в магазине:'
+SHOPPING_LIST_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+
+    Метод stream отдаёт документ по частям из итератора строк
+    агрегированного списка. Ответы с ошибками рендерятся тем же
+    форматом из текста ошибки.
+    """
+    charset = 'utf-8'
+    file_name = 'shopping_list'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = [{'error': str(data.get('detail', data))}]
+        return b''.join(self.stream(data))
+
+    def stream(self, ingredients):
+        raise NotImplementedError
+
+    @staticmethod
+    def format_line(ingredient):
+        if 'error' in ingredient:
+            return ingredient['error']
+        return (f'{ingredient["ingredient__name"]} '
+                f'({ingredient["ingredient__measurement_unit"]}) - '
+                f'{ingredient["amount"]}')
+
+
+class PlainTextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield SHOPPING_LIST_TITLE.encode(self.charset)
+        for ingredient in ingredients:
+            yield f'\n{self.format_line(ingredient)}'.encode(self.charset)
+
+
+class Echo:
+    """ Буфер для csv.writer, возвращающий записанную строку. """
+
+    def write(self, value):
+        return value
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(SHOPPING_LIST_HEADER).encode(self.charset)
+        for ingredient in ingredients:
+            if 'error' in ingredient:
+                row = (ingredient['error'], )
+            else:
+                row = (ingredient['ingredient__name'],
+                       ingredient['ingredient__measurement_unit'],
+                       ingredient['amount'])
+            yield writer.writerow(row).encode(self.charset)
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    """
+    Список покупок в PDF.
+
+    Формат PDF требует таблицу смещений в конце файла, поэтому
+    документ собирается целиком и отдаётся частями после сборки.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    line_height = 18
+    margin = 50
+    chunk_size = 64 * 1024
+
+    def register_font(self):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_FONT))
+
+    def stream(self, ingredients):
+        self.register_font()
+        buffer = BytesIO()
+        document = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        position = height - self.margin
+        document.setFont(self.font_name, self.font_size + 4)
+        document.drawString(self.margin, position, SHOPPING_LIST_TITLE)
+        document.setFont(self.font_name, self.font_size)
+        for ingredient in ingredients:
+            position -= self.line_height
+            if position < self.margin:
+                document.showPage()
+                document.setFont(self.font_name, self.font_size)
+                position = height - self.margin
+            document.drawString(
+                self.margin, position, self.format_line(ingredient))
+        document.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(self.chunk_size), b'')
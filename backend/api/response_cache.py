@@ -0,0 +1,130 @@
+from hashlib import sha1
+
+from django.core.cache import caches
+from django.db.models import Max
+from django.http import HttpResponse
+
+from recipes.models import RecipeScore
+
+from .cache import VersionCounter, catalog_version
+from .metrics import metrics
+
+RESPONSE_CACHE_ALIAS = 'responses'
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Vary')
+RANKED_ORDERING_PARAM = 'ordering'
+
+recipes_version = VersionCounter('recipes-version')
+
+metrics.describe(
+    'response_cache_total', 'Обращения к кэшу ответов для анонимов.')
+
+
+def get_recipe_version(recipe_id):
+    return VersionCounter(f'recipe-version:{recipe_id}')
+
+
+def get_author_version(author_id):
+    return VersionCounter(f'author-version:{author_id}')
+
+
+def get_scores_version(query_params):
+    """
+    Версия рейтингов для выдачи с сортировкой по рейтингу.
+
+    Рейтинги пересчитывает отдельный процесс, поэтому версия
+    читается из базы: время последнего пересчёта, max по индексу.
+    """
+    if query_params.get(RANKED_ORDERING_PARAM):
+        return RecipeScore.objects.aggregate(
+            version=Max('updated_at'))['version']
+    return None
+
+
+def normalize_query(query_params):
+    """ Строка запроса с отсортированными параметрами и значениями. """
+    return '&'.join(
+        f'{name}={value}'
+        for name in sorted(query_params)
+        for value in sorted(query_params.getlist(name))
+        if value != ''
+    )
+
+
+class AnonymousCacheMixin:
+    """
+    Кэш отрендеренных ответов list/retrieve для анонимных GET.
+
+    Ключ списка включает версию всех рецептов, версию каталога,
+    версию рейтингов при сортировке по ним и нормализованную строку
+    запроса (фильтры и пагинация). Ключ
+    рецепта — его собственную версию и версию каталога; версия
+    автора хранится в записи и сверяется при чтении. Версии
+    увеличиваются сигналами при записи.
+    """
+    cached_actions = ('list', 'retrieve')
+
+    def get_response_cache_key(self, request):
+        if (request.method != 'GET' or request.user.is_authenticated
+                or self.action not in self.cached_actions
+                or request.accepted_renderer.format != 'json'):
+            return None
+        if self.action == 'retrieve':
+            recipe_id = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            return (f'recipe:{recipe_id}:'
+                    f'{get_recipe_version(recipe_id).get()}:'
+                    f'{catalog_version.get()}')
+        query = sha1(normalize_query(request.query_params).encode())
+        return (f'recipes:{recipes_version.get()}:{catalog_version.get()}:'
+                f'{get_scores_version(request.query_params)}:'
+                f'{query.hexdigest()}')
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request) or super().list(
+            request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(request) or super().retrieve(
+            request, *args, **kwargs)
+
+    def get_cached_response(self, request):
+        self.response_cache_key = self.get_response_cache_key(request)
+        if self.response_cache_key is None:
+            return None
+        cached = caches[RESPONSE_CACHE_ALIAS].get(self.response_cache_key)
+        if cached is None or any(
+                get_author_version(author_id).get() != version
+                for author_id, version in cached['authors']):
+            return None
+        metrics.inc('response_cache_total', result='hit', action=self.action)
+        response = HttpResponse(
+            cached['content'], content_type=cached['content_type'])
+        for header, value in cached['headers'].items():
+            response[header] = value
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+        if key is None or response.get('X-Cache') == 'HIT':
+            return response
+        if response.status_code == 200:
+            response.render()
+            authors = ()
+            if self.action == 'retrieve':
+                author_id = response.data['author']['id']
+                authors = ((author_id, get_author_version(author_id).get()),)
+            caches[RESPONSE_CACHE_ALIAS].set(key, {
+                'content': response.content,
+                'content_type': response['Content-Type'],
+                'headers': {
+                    header: response[header] for header in CACHED_HEADERS
+                    if response.has_header(header)
+                },
+                'authors': authors,
+            })
+            metrics.inc(
+                'response_cache_total', result='miss', action=self.action)
+            response['X-Cache'] = 'MISS'
+        return response
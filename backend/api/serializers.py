@@ -1,13 +1,17 @@
 # pylint: disable=no-member
-from drf_extra_fields.fields import Base64ImageField
+from django.db import IntegrityError, transaction
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
 
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                             ShoppingCart, Tag)
+from recipes.signals import (recipe_changed, relations_created,
+                             relations_deleted)
 from users.models import User, Follow
-from common.constants import MIN_VALUE, MAX_VALUE, MIN_TIME, MAX_TIME
+from common.constants import (MAX_PAGE_SIZE, MIN_VALUE, MAX_VALUE, MIN_TIME,
+                              MAX_TIME)
+from .fields import RecipeImageField, RecipeImageUploadField
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -20,6 +24,8 @@ class UserSerializer(serializers.ModelSerializer):
                   'last_name', 'is_subscribed', )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return request.user.is_authenticated and obj.following.filter(
             user=request.user).exists()
@@ -61,9 +67,14 @@ class SubscribeListSerializer(UserSerializer):
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
+        latest_recipes = self.context.get('latest_recipes')
+        if latest_recipes is not None:
+            return RecipeShortSerializer(
+                latest_recipes.get(obj.id, []), many=True, read_only=True
+            ).data
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
         recipes = obj.recipes.all()
@@ -126,7 +137,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         source='ingredienttorecipe')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField(max_length=None)
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -135,15 +146,33 @@ class RecipeReadSerializer(serializers.ModelSerializer):
                   'name', 'image', 'text', 'cooking_time')
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return request.user.is_authenticated and obj.favorites.filter(
             user=request.user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return request.user.is_authenticated and obj.shopping_list.filter(
             user=request.user).exists()
 
+    def to_representation(self, instance):
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
+
+class RecipeMatchSerializer(RecipeReadSerializer):
+    """ Сериализатор рецепта, подобранного по ингредиентам """
+    coverage = serializers.FloatField(read_only=True)
+    missing = serializers.IntegerField(read_only=True)
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + ('coverage', 'missing')
+
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
     """ Сериализатор для создания рецепта """
@@ -155,7 +184,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all(),
         error_messages={'does_not_exist': 'Указанного тега не существует'}
     )
-    image = Base64ImageField(max_length=None)
+    image = RecipeImageUploadField(max_length=None)
     author = UserSerializer(read_only=True)
     cooking_time = serializers.IntegerField(min_value=MIN_TIME,
                                             max_value=MAX_TIME)
@@ -208,15 +237,57 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=request.user, **validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        recipe_changed.send(sender=Recipe, instance=recipe)
         return recipe
 
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        """
+        Запись только изменившихся ингредиентов рецепта.
+
+        Новые строки создаются, у существующих меняется количество,
+        отсутствующие в запросе удаляются.
+        """
+        amounts = {
+            ingredient_data['id'].pk: ingredient_data['amount']
+            for ingredient_data in ingredients
+        }
+        existing = {
+            item.ingredient_id: item
+            for item in IngredientRecipe.objects.filter(recipe=recipe)
+        }
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, item in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        added = [
+            IngredientRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in existing
+        ]
+        if added:
+            IngredientRecipe.objects.bulk_create(added)
+
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        instance.tags.set(validated_data.pop('tags'))
-        ingredients = validated_data.pop('ingredients')
-        self.create_ingredients(instance, ingredients)
-        return super().update(instance, validated_data)
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        with transaction.atomic():
+            recipe = super().update(instance, validated_data)
+            if tags is not None:
+                recipe.tags.set(tags)
+            if ingredients is not None:
+                self.update_ingredients(recipe, ingredients)
+            recipe_changed.send(sender=Recipe, instance=recipe)
+        return recipe
 
     def to_representation(self, instance):
         return RecipeReadSerializer(instance, context=self.context).data
@@ -224,6 +295,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     """ Сериализатор полей избранных рецептов и покупок """
+    image = RecipeImageField(thumbnail=True)
 
     class Meta:
         model = Recipe
@@ -258,3 +330,112 @@ class ShoppingCartSerializer(FavoriteSerializer):
     class Meta:
         model = ShoppingCart
         fields = ('user', 'recipe',)
+
+
+class FavoriteBatchSerializer(serializers.Serializer):
+    """ Пакетное добавление и удаление рецептов в избранном """
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=MAX_PAGE_SIZE,
+        default=list,
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=MAX_PAGE_SIZE,
+        default=list,
+    )
+
+    class Meta:
+        model = Favorite
+
+    def validate(self, data):
+        if not data['add'] and not data['remove']:
+            raise serializers.ValidationError(
+                'Передайте рецепты в add или remove.')
+        if set(data['add']) & set(data['remove']):
+            raise serializers.ValidationError(
+                'Рецепт не может быть одновременно в add и remove.')
+        return data
+
+    def create(self, validated_data):
+        """
+        Добавление одним bulk_create и удаление одним DELETE.
+
+        Сигналы отправляются пакетом только по рецептам, которые этот
+        вызов действительно добавил или удалил. Возвращает статус по
+        каждому переданному рецепту.
+        """
+        model = self.Meta.model
+        user = validated_data['user']
+        add = list(dict.fromkeys(validated_data['add']))
+        remove = list(dict.fromkeys(validated_data['remove']))
+        with transaction.atomic():
+            found = set(Recipe.objects.filter(
+                pk__in=add).values_list('pk', flat=True))
+            existing = set(model.objects.filter(
+                user=user, recipe_id__in=add
+            ).values_list('recipe_id', flat=True))
+            created = self.insert_relations(model, user, [
+                recipe_id for recipe_id in add
+                if recipe_id in found and recipe_id not in existing
+            ])
+            relations = model.objects.filter(user=user, recipe_id__in=remove)
+            removed = set(relations.select_for_update().values_list(
+                'recipe_id', flat=True))
+            if removed:
+                # Без выборки строк и построчных pre/post_delete:
+                # получатели relations_deleted обрабатывают пакет целиком.
+                relations._raw_delete(relations.db)
+                relations_deleted.send(
+                    sender=model, user=user, recipe_ids=list(removed))
+            if created:
+                relations_created.send(
+                    sender=model, user=user, recipe_ids=created)
+        created = set(created)
+        return {
+            'add': [
+                {'id': recipe_id, 'status': (
+                    'not_found' if recipe_id not in found
+                    else 'added' if recipe_id in created else 'exists')}
+                for recipe_id in add
+            ],
+            'remove': [
+                {'id': recipe_id, 'status': (
+                    'removed' if recipe_id in removed else 'not_found')}
+                for recipe_id in remove
+            ],
+        }
+
+    @staticmethod
+    def insert_relations(model, user, recipe_ids):
+        """
+        Вставка связей; возвращает рецепты, вставленные этим вызовом.
+
+        Обычно это один bulk_create. Если параллельный запрос успел
+        вставить ту же пару, строки вставляются по одной и занятые
+        пропускаются.
+        """
+        objects = [
+            model(user=user, recipe_id=recipe_id) for recipe_id in recipe_ids]
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(objects)
+            return recipe_ids
+        except IntegrityError:
+            pass
+        created = []
+        for relation in objects:
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create([relation])
+            except IntegrityError:
+                continue
+            created.append(relation.recipe_id)
+        return created
+
+
+class ShoppingCartBatchSerializer(FavoriteBatchSerializer):
+    """ Пакетное добавление и удаление рецептов в списке покупок """
+
+    class Meta:
+        model = ShoppingCart
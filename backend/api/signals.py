@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.images import image_processed
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.signals import (recipe_changed, relations_created,
+                             relations_deleted)
+from users.models import Follow, User
+from .authentication import forget_tokens
+from .cache import catalog_version
+from .conditional import get_relations_version
+from .recipe_matcher import matcher_version, recipe_matcher
+from .response_cache import (get_author_version, get_recipe_version,
+                             recipes_version)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def bump_catalog_version(**kwargs):
+    catalog_version.bump()
+
+
+@receiver(recipe_changed, sender=Recipe)
+def update_recipe_matcher(sender, instance, **kwargs):
+    transaction.on_commit(lambda: recipe_matcher.update_recipe(instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_recipe_matcher(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: recipe_matcher.update_recipe(recipe_id, ()))
+
+
+@receiver(post_delete, sender=Ingredient)
+def reset_recipe_matcher(**kwargs):
+    matcher_version.bump()
+
+
+def bump_recipe_versions(recipe_id):
+    get_recipe_version(recipe_id).bump()
+    recipes_version.bump()
+
+
+@receiver((post_save, post_delete, recipe_changed), sender=Recipe)
+def invalidate_recipe_responses(sender, instance, **kwargs):
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: bump_recipe_versions(recipe_id))
+
+
+@receiver(image_processed, sender=Recipe)
+def invalidate_recipe_image_responses(sender, recipe_id, **kwargs):
+    bump_recipe_versions(recipe_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    author_id = instance.pk
+    transaction.on_commit(lambda: (
+        get_author_version(author_id).bump(), recipes_version.bump()))
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Follow)
+def bump_relations_version(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: get_relations_version(user_id).bump())
+
+
+@receiver((relations_created, relations_deleted), sender=Favorite)
+@receiver((relations_created, relations_deleted), sender=ShoppingCart)
+def bump_relations_version_bulk(sender, user, **kwargs):
+    user_id = user.pk
+    transaction.on_commit(lambda: get_relations_version(user_id).bump())
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    forget_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    forget_tokens(*Token.objects.filter(
+        user=instance).values_list('key', flat=True))
@@ -0,0 +1,548 @@
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import (APIClient, APIRequestFactory,
+                                 force_authenticate)
+
+from api.benchmarks import count_writes
+from api.lean_serializers import RecipeListLeanSerializer
+from api.metrics import metrics
+from api.serializers import FavoriteBatchSerializer, RecipeReadSerializer
+from api.views import RecipeViewSet
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            RecipeScore, ShoppingCart, ShoppingListItem, Tag)
+from recipes.scores import update_dirty_scores
+from recipes.search import update_search_index
+from recipes.shopping_list import rebuild_shopping_lists
+from users.models import Follow, User
+
+RECIPES_COUNT = 100
+SMALL_PAGE = 6
+
+
+class RecipeDataMixin:
+    """ Пользователи, справочники и RECIPES_COUNT рецептов. """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='viewer', email='viewer@example.com', password='pass')
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com', password='pass')
+            for number in range(5)
+        ]
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', slug=f'tag{number}',
+                color=f'#00000{number}')
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        ]
+        cls.recipes = []
+        for number in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=cls.authors[number % len(cls.authors)],
+                name=f'Рецепт {number}', text=f'Описание {number}',
+                image='recipes/image/test.jpg', cooking_time=number + 1)
+            recipe.tags.set(cls.tags[:number % len(cls.tags) + 1])
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient,
+                    amount=number + 1)
+                for ingredient in cls.ingredients[number % 5:number % 5 + 3]
+            )
+            cls.recipes.append(recipe)
+        Follow.objects.create(user=cls.user, author=cls.authors[0])
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[1])
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        self.client = APIClient()
+        self.auth_client = APIClient()
+        self.auth_client.force_authenticate(self.user)
+
+    def count_queries(self, client, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, data)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(context.captured_queries)
+
+    def assertQueriesPerPageConstant(self, client, url, data=None):
+        """ Первый запрос прогревает индексы и кэши процесса. """
+        data = data or {}
+        client.get(url, data)
+        small = self.count_queries(
+            client, url, {**data, 'limit': SMALL_PAGE})
+        large = self.count_queries(
+            client, url, {**data, 'limit': RECIPES_COUNT})
+        self.assertEqual(small, large, f'{url} {data}')
+
+
+class RecipeListQueriesTest(RecipeDataMixin, TestCase):
+    """ Число запросов списка рецептов не зависит от размера страницы. """
+
+    def test_anonymous(self):
+        self.assertQueriesPerPageConstant(self.client, '/api/recipes/')
+
+    def test_authenticated(self):
+        self.assertQueriesPerPageConstant(self.auth_client, '/api/recipes/')
+
+    def test_flags(self):
+        response = self.auth_client.get(
+            '/api/recipes/', {'limit': RECIPES_COUNT})
+        recipes = {
+            recipe['id']: recipe for recipe in response.json()['results']}
+        self.assertEqual(len(recipes), RECIPES_COUNT)
+        favorite, cart = self.recipes[0].pk, self.recipes[1].pk
+        for recipe_id, recipe in recipes.items():
+            self.assertEqual(recipe['is_favorited'], recipe_id == favorite)
+            self.assertEqual(
+                recipe['is_in_shopping_cart'], recipe_id == cart)
+            self.assertEqual(
+                recipe['author']['is_subscribed'],
+                recipe['author']['id'] == self.authors[0].pk)
+
+
+class RecipeMatchTest(RecipeDataMixin, TestCase):
+    """ Подбор рецептов всегда отдаётся постранично по номерам. """
+
+    def test_pagination_params(self):
+        ingredients = ','.join(
+            str(ingredient.pk) for ingredient in self.ingredients[:3])
+        for params in ({}, {'pagination': 'cursor'},
+                       {'count': 'estimated'}):
+            response = self.client.get('/api/recipes/match/', {
+                'ingredients': ingredients, 'limit': SMALL_PAGE, **params})
+            self.assertEqual(response.status_code, 200, params)
+            self.assertEqual(len(response.json()['results']), SMALL_PAGE)
+            self.assertIn('count', response.json())
+
+
+class RecipeUpdateWritesTest(RecipeDataMixin, TestCase):
+    """ Правка рецепта пишет только изменившиеся теги и ингредиенты. """
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[0]
+        self.author_client = APIClient()
+        self.author_client.force_authenticate(self.recipe.author)
+        self.tag_ids = list(self.recipe.tags.values_list('pk', flat=True))
+        self.recipe_ingredients = [
+            {'id': item.ingredient_id, 'amount': item.amount}
+            for item in self.recipe.ingredienttorecipe.order_by('id')
+        ]
+
+    def update(self, **changes):
+        """ PATCH рецепта; возвращает записи по таблицам. """
+        data = {'tags': self.tag_ids, 'ingredients': self.recipe_ingredients,
+                **changes}
+        with CaptureQueriesContext(connection) as context:
+            response = self.author_client.patch(
+                f'/api/recipes/{self.recipe.pk}/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return count_writes(context.captured_queries)
+
+    def assertTableWrites(self, writes, table, expected):
+        self.assertEqual(
+            {statement: count for statement, count in writes.items()
+             if statement.endswith(f' {table}')},
+            expected)
+
+    def test_text_only(self):
+        writes = self.update(text='Исправленное описание')
+        self.assertTableWrites(writes, 'recipes_ingredientrecipe', {})
+        self.assertTableWrites(writes, 'recipes_recipe_tags', {})
+        self.assertEqual(writes['UPDATE recipes_recipe'], 1)
+
+    def test_amount_changed(self):
+        changed = {**self.recipe_ingredients[0],
+                   'amount': self.recipe_ingredients[0]['amount'] + 1}
+        writes = self.update(
+            ingredients=[changed, *self.recipe_ingredients[1:]])
+        self.assertTableWrites(
+            writes, 'recipes_ingredientrecipe',
+            {'UPDATE recipes_ingredientrecipe': 1})
+        self.assertTableWrites(writes, 'recipes_recipe_tags', {})
+        self.assertEqual(
+            self.recipe.ingredienttorecipe.get(
+                ingredient_id=changed['id']).amount,
+            changed['amount'])
+
+    def test_tag_and_ingredient_replaced(self):
+        other_tag = next(
+            tag for tag in self.tags if tag.pk not in self.tag_ids)
+        used = {item['id'] for item in self.recipe_ingredients}
+        other_ingredient = next(
+            ingredient for ingredient in self.ingredients
+            if ingredient.pk not in used)
+        writes = self.update(
+            tags=[other_tag.pk],
+            ingredients=[{'id': other_ingredient.pk, 'amount': 1},
+                         *self.recipe_ingredients[1:]])
+        self.assertTableWrites(
+            writes, 'recipes_ingredientrecipe',
+            {'DELETE recipes_ingredientrecipe': 1,
+             'INSERT recipes_ingredientrecipe': 1})
+        self.assertTableWrites(
+            writes, 'recipes_recipe_tags',
+            {'DELETE recipes_recipe_tags': 1,
+             'INSERT recipes_recipe_tags': 1})
+        self.assertEqual(
+            set(self.recipe.tags.values_list('pk', flat=True)),
+            {other_tag.pk})
+        self.assertEqual(
+            set(self.recipe.ingredienttorecipe.values_list(
+                'ingredient_id', flat=True)),
+            {other_ingredient.pk,
+             *(item['id'] for item in self.recipe_ingredients[1:])})
+
+
+class ConditionalGetTest(RecipeDataMixin, TestCase):
+    """ ETag рецепта и ответы 304. """
+
+    def test_not_modified(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalid_pk(self):
+        response = self.client.get(
+            '/api/recipes/abc/', HTTP_IF_NONE_MATCH='"etag"')
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_queries(self):
+        url = '/api/recipes/'
+        data = {'pagination': 'cursor', 'limit': SMALL_PAGE}
+        self.auth_client.get(url, data)
+        with CaptureQueriesContext(connection) as plain:
+            etag = self.auth_client.get(url, data)['ETag']
+        with CaptureQueriesContext(connection) as conditional:
+            response = self.auth_client.get(
+                url, data, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(
+            len(conditional.captured_queries), len(plain.captured_queries))
+        for query in plain.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+            self.assertNotIn('MAX(', query['sql'].upper())
+
+    def test_list_changed(self):
+        url = '/api/recipes/'
+        etag = self.auth_client.get(url)['ETag']
+        Favorite.objects.create(user=self.user, recipe=self.recipes[-1])
+        self.assertEqual(
+            self.auth_client.get(
+                url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class RankedListTest(RecipeDataMixin, TestCase):
+    """ Пересчёт рейтингов сбрасывает ETag и кэш выдачи по рейтингу. """
+
+    def test_scores_update(self):
+        update_dirty_scores(RECIPES_COUNT)
+        url = '/api/recipes/'
+        data = {'ordering': 'popular', 'limit': SMALL_PAGE}
+        response = self.client.get(url, data)
+        etag = response['ETag']
+        favorite = self.recipes[RECIPES_COUNT // 2]
+        self.assertNotEqual(response.json()['results'][0]['id'], favorite.pk)
+        for author in self.authors:
+            Favorite.objects.create(user=author, recipe=favorite)
+        self.assertEqual(
+            self.client.get(url, data, HTTP_IF_NONE_MATCH=etag).status_code,
+            304)
+        update_dirty_scores(RECIPES_COUNT)
+        response = self.client.get(url, data, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['id'], favorite.pk)
+
+    def test_scores_updated_elsewhere(self):
+        """ Пересчёт в другом процессе виден без сигналов и счётчиков. """
+        url = '/api/recipes/'
+        data = {'ordering': 'popular', 'limit': SMALL_PAGE}
+        self.client.get(url, data)
+        self.assertEqual(self.client.get(url, data)['X-Cache'], 'HIT')
+        recipe = self.recipes[RECIPES_COUNT // 2]
+        RecipeScore.objects.filter(recipe=recipe).update(
+            popular=RECIPES_COUNT, updated_at=timezone.now())
+        response = self.client.get(url, data)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['results'][0]['id'], recipe.pk)
+
+
+class LeanSerializerTest(RecipeDataMixin, TestCase):
+    """ Облегчённый сериализатор списка совпадает с RecipeReadSerializer. """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Recipe.objects.filter(pk__in=[
+            recipe.pk for recipe in cls.recipes[::3]
+        ]).update(thumbnail='recipes/thumbnails/test.webp')
+
+    def get_view(self, user=None):
+        request = APIRequestFactory().get('/api/recipes/')
+        if user is not None:
+            force_authenticate(request, user=user)
+        view = RecipeViewSet(
+            action_map={'get': 'list'}, format_kwarg=None, kwargs={})
+        view.request = view.initialize_request(request)
+        return view
+
+    def test_byte_identical(self):
+        renderer = JSONRenderer()
+        for user in (None, self.user):
+            view = self.get_view(user)
+            queryset = view.filter_queryset(view.get_queryset())
+            rows = queryset.prefetch_related(None).values(
+                *RecipeListLeanSerializer.fields)
+            for thumbnails in (True, False):
+                context = {**view.get_serializer_context(),
+                           'thumbnails': thumbnails}
+                with self.subTest(user=user, thumbnails=thumbnails):
+                    self.assertEqual(
+                        renderer.render(RecipeListLeanSerializer(
+                            rows, context=context).data),
+                        renderer.render(RecipeReadSerializer(
+                            queryset, many=True, context=context).data))
+
+    def test_queries(self):
+        """ Авторы, связи с тегами и ингредиенты; теги — из памяти. """
+        view = self.get_view(self.user)
+        rows = list(view.get_queryset().prefetch_related(None).values(
+            *RecipeListLeanSerializer.fields))
+        context = view.get_serializer_context()
+        RecipeListLeanSerializer(rows, context=context).data
+        with self.assertNumQueries(3):
+            RecipeListLeanSerializer(rows, context=context).data
+
+    def test_list_response(self):
+        response = self.auth_client.get(
+            '/api/recipes/', {'limit': RECIPES_COUNT})
+        view = self.get_view(self.user)
+        expected = RecipeReadSerializer(
+            view.get_queryset(), many=True,
+            context=view.get_serializer_context()).data
+        self.assertEqual(
+            response.json()['results'],
+            json.loads(JSONRenderer().render(expected)))
+
+
+class RecipeReadQueriesTest(RecipeDataMixin, TestCase):
+    """ Выдачи через RecipeReadSerializer не делают запросов на строку. """
+
+    def test_serializer(self):
+        view = RecipeViewSet(
+            action_map={'get': 'retrieve'}, format_kwarg=None, kwargs={})
+        request = APIRequestFactory().get('/api/recipes/')
+        force_authenticate(request, user=self.user)
+        view.request = view.initialize_request(request)
+        counts = []
+        for size in (SMALL_PAGE, RECIPES_COUNT):
+            with CaptureQueriesContext(connection) as context:
+                RecipeReadSerializer(
+                    view.get_queryset()[:size], many=True,
+                    context=view.get_serializer_context()).data
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_match(self):
+        self.assertQueriesPerPageConstant(
+            self.auth_client, '/api/recipes/match/',
+            {'ingredients': ','.join(
+                str(ingredient.pk) for ingredient in self.ingredients)})
+
+    def test_feed(self):
+        self.assertQueriesPerPageConstant(
+            self.auth_client, '/api/recipes/feed/')
+
+    def test_users_list(self):
+        self.assertEqual(
+            self.count_queries(self.auth_client, '/api/users/', {'limit': 1}),
+            self.count_queries(
+                self.auth_client, '/api/users/', {'limit': SMALL_PAGE}))
+
+
+class RecipeSearchTest(RecipeDataMixin, TestCase):
+    """ Полнотекстовый поиск и его сочетание с фильтрами. """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.soup = Recipe.objects.create(
+            author=cls.authors[1], name='Суп из томатов',
+            text='Варить полчаса', image='recipes/image/test.jpg',
+            cooking_time=30)
+        cls.soup.tags.set([cls.tags[0]])
+        cls.salad = Recipe.objects.create(
+            author=cls.authors[2], name='Салат',
+            text='Добавить томаты по вкусу', image='recipes/image/test.jpg',
+            cooking_time=10)
+        cls.salad.tags.set([cls.tags[1]])
+        Favorite.objects.create(user=cls.user, recipe=cls.soup)
+        update_search_index(
+            Recipe.objects.values_list('pk', flat=True))
+
+    def search(self, client=None, **params):
+        response = (client or self.client).get(
+            '/api/recipes/', {'search': 'томат', **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_ranking(self):
+        self.assertEqual(self.search(), [self.soup.pk, self.salad.pk])
+
+    def test_word_forms(self):
+        """ «томат» находит «томатов» и «томаты» без учёта регистра. """
+        self.assertEqual(
+            self.search(search='ТОМАТ'), [self.soup.pk, self.salad.pk])
+
+    def test_filters(self):
+        self.assertEqual(self.search(tags='tag1'), [self.salad.pk])
+        self.assertEqual(
+            self.search(self.auth_client, is_favorited=1), [self.soup.pk])
+
+    def test_results_limit(self):
+        with mock.patch('recipes.search.SEARCH_RESULTS_LIMIT', 1):
+            response = self.client.get('/api/recipes/', {'search': 'томат'})
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(
+            response.json()['results'][0]['id'], self.soup.pk)
+
+
+class TagsFilterTest(RecipeDataMixin, TestCase):
+    """ Фильтр по тегам в режимах any и all. """
+
+    def filter(self, *slugs, **params):
+        response = self.client.get('/api/recipes/', {
+            'tags': slugs, 'limit': RECIPES_COUNT, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def expected(self, tag_number):
+        """ Рецепты с тегом tag<tag_number>: у рецепта n теги 0..n % 3. """
+        return {
+            recipe.pk for number, recipe in enumerate(self.recipes)
+            if number % len(self.tags) >= tag_number
+        }
+
+    def test_any(self):
+        recipe_ids = self.filter('tag1', 'tag2')
+        self.assertEqual(len(recipe_ids), len(set(recipe_ids)))
+        self.assertEqual(set(recipe_ids), self.expected(1))
+        self.assertEqual(
+            recipe_ids, self.filter('tag1', 'tag2', tags_mode='any'))
+
+    def test_all(self):
+        recipe_ids = self.filter('tag1', 'tag2', tags_mode='all')
+        self.assertEqual(len(recipe_ids), len(set(recipe_ids)))
+        self.assertEqual(set(recipe_ids), self.expected(2))
+
+    def test_unknown_slug(self):
+        self.assertEqual(
+            self.filter('tag0', 'unknown', tags_mode='all'), [])
+        self.assertEqual(
+            len(self.filter('tag0', 'unknown')), RECIPES_COUNT)
+
+    def test_no_tag_lookups(self):
+        """ slug разрешаются по карте в памяти, без запроса на тег. """
+        self.filter('tag0')
+        url = '/api/recipes/'
+        single = self.count_queries(self.client, url, {'tags': ['tag0']})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, {'tags': ['tag0', 'tag1', 'tag2']})
+        self.assertEqual(len(context.captured_queries), single)
+        for query in context.captured_queries:
+            self.assertNotRegex(query['sql'], r'"slug" (=|IN)')
+
+    """ Пакетное избранное и корзина. """
+
+    def batch(self, relation, **data):
+        response = self.auth_client.post(
+            f'/api/recipes/{relation}/batch/', data, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def shopping_list(self):
+        return set(ShoppingListItem.objects.filter(
+            user=self.user).values_list('ingredient_id', 'amount'))
+
+    def test_remove_queries_constant(self):
+        recipe_ids = [recipe.pk for recipe in self.recipes[10:20]]
+        for relation in ('favorite', 'shopping_cart'):
+            self.batch(relation, add=recipe_ids)
+            counts = []
+            for removed in (recipe_ids[:1], recipe_ids[1:SMALL_PAGE]):
+                with CaptureQueriesContext(connection) as context:
+                    self.batch(relation, remove=removed)
+                counts.append(len(context.captured_queries))
+            self.assertEqual(counts[0], counts[1], relation)
+
+    def test_remove_side_effects(self):
+        recipes = self.recipes[10:13]
+        recipe_ids = [recipe.pk for recipe in recipes]
+        self.batch('favorite', add=recipe_ids)
+        self.batch('shopping_cart', add=recipe_ids)
+        result = self.batch('favorite', remove=recipe_ids[:2])
+        self.assertEqual(
+            [item['status'] for item in result['remove']],
+            ['removed', 'removed'])
+        self.batch('shopping_cart', remove=recipe_ids[:2])
+        self.assertEqual(
+            list(Recipe.objects.filter(pk__in=recipe_ids).order_by(
+                'pk').values_list('favorites_count', flat=True)),
+            [0, 0, 1])
+        expected = self.shopping_list()
+        rebuild_shopping_lists([self.user.pk])
+        self.assertEqual(expected, self.shopping_list())
+        self.assertFalse(ShoppingCart.objects.filter(
+            user=self.user, recipe_id__in=recipe_ids[:2]).exists())
+
+    def test_concurrent_insert(self):
+        """ Пара, вставленная параллельно, не считается добавленной. """
+        taken, free = self.recipes[20], self.recipes[21]
+        Favorite.objects.bulk_create(
+            [Favorite(user=self.user, recipe=taken)])
+        self.assertEqual(
+            FavoriteBatchSerializer.insert_relations(
+                Favorite, self.user, [taken.pk, free.pk]),
+            [free.pk])
+        self.assertEqual(
+            Favorite.objects.filter(user=self.user, recipe=free).count(), 1)
+
+
+class AnonymousCacheTest(RecipeDataMixin, TestCase):
+    """ Кэш ответов для анонимов. """
+
+    def misses(self):
+        return metrics.get(
+            'response_cache_total', result='miss', action='retrieve')
+
+    def test_hit_after_miss(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_not_found_is_not_a_miss(self):
+        misses = self.misses()
+        response = self.client.get('/api/recipes/0/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('X-Cache'))
+        self.assertEqual(self.misses(), misses)
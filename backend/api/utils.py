@@ -0,0 +1,78 @@
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.exceptions import ValidationError
+
+from common.constants import MATCH_MAX_INGREDIENTS
+from recipes.models import Recipe
+
+
+def get_latest_recipes(author_ids, limit=None):
+    """
+    Последние рецепты каждого автора одним запросом.
+
+    При заданном limit рецепты нумеруются оконной функцией
+    ROW_NUMBER() внутри автора, и отбираются первые limit штук.
+    """
+    latest_recipes = defaultdict(list)
+    if not author_ids:
+        return latest_recipes
+    queryset = Recipe.objects.filter(author_id__in=author_ids)
+    if limit is None:
+        recipes = queryset.only(
+            'id', 'name', 'image', 'thumbnail', 'cooking_time', 'author_id')
+    else:
+        ranked = queryset.order_by().annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=F('pub_date').desc(),
+            )
+        ).values(
+            'id', 'name', 'image', 'thumbnail', 'cooking_time', 'author_id',
+            'row_number'
+        )
+        sql, params = ranked.query.sql_with_params()
+        recipes = Recipe.objects.raw(
+            f'SELECT * FROM ({sql}) AS ranked '
+            'WHERE ranked.row_number <= %s '
+            'ORDER BY ranked.author_id, ranked.row_number',
+            (*params, limit),
+        )
+    for recipe in recipes:
+        latest_recipes[recipe.author_id].append(recipe)
+    return latest_recipes
+
+
+def get_recipes_limit(request):
+    """ Значение параметра recipes_limit или None. """
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError, TypeError):
+        return None
+    return limit if limit >= 0 else None
+
+
+def get_match_params(request):
+    """ Ингредиенты и допустимое число недостающих из запроса. """
+    try:
+        ingredient_ids = {
+            int(value) for value
+            in request.query_params.get('ingredients', '').split(',')
+            if value.strip()
+        }
+        max_missing = request.query_params.get('max_missing')
+        if max_missing is not None:
+            max_missing = int(max_missing)
+    except ValueError:
+        raise ValidationError(
+            'ingredients — список id через запятую, max_missing — число')
+    if not ingredient_ids:
+        raise ValidationError({'ingredients': 'Укажите ингредиенты'})
+    if len(ingredient_ids) > MATCH_MAX_INGREDIENTS:
+        raise ValidationError({'ingredients': (
+            f'Не более {MATCH_MAX_INGREDIENTS} ингредиентов')})
+    if max_missing is not None and max_missing < 0:
+        raise ValidationError({'max_missing': 'Не может быть отрицательным'})
+    return ingredient_ids, max_missing
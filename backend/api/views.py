@@ -1,6 +1,7 @@
 # pylint: disable=no-member
-from django.db.models import Sum, Prefetch
-from django.http.response import FileResponse
+from django.db.models import Exists, OuterRef, Prefetch, Value
+from django.http.response import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as BaseUserViewSet
 from rest_framework import status, viewsets
@@ -9,41 +10,84 @@ from rest_framework.permissions import (IsAuthenticated)
 from rest_framework.response import Response
 
 from users.models import Follow, User
+from .cache import catalog_cache
+from .conditional import ConditionalGetMixin
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
+from .ingredient_index import ingredient_index
+from .lean_serializers import LeanListMixin, RecipeListLeanSerializer
+from .pagination import (CustomPagination, FeedPagination,
+                         KeysetPaginationMixin, UsernameKeysetPagination)
 from .permissions import AuthorPermission
-from .serializers import (CreateRecipeSerializer, FavoriteSerializer,
-                          IngredientSerializer, RecipeReadSerializer,
+from .recipe_matcher import recipe_matcher
+from .renderers import (CSVShoppingListRenderer, PDFShoppingListRenderer,
+                        PlainTextShoppingListRenderer)
+from .response_cache import AnonymousCacheMixin
+from .serializers import (CreateRecipeSerializer, FavoriteBatchSerializer,
+                          FavoriteSerializer,
+                          IngredientSerializer, RecipeMatchSerializer,
+                          RecipeReadSerializer,
+                          ShoppingCartBatchSerializer,
                           ShoppingCartSerializer, SubscribeListSerializer,
                           TagSerializer, UserSerializer,
                           SubscribeCreateSerializer)
+from .utils import get_latest_recipes, get_match_params, get_recipes_limit
+from recipes.feed import get_feed_streams
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class CatalogMixin:
+    """ Отдача справочника из кэша каталога с проверкой ETag. """
+    catalog_name = None
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        content, etag = catalog_cache.get(
+            self.catalog_name,
+            lambda: self.get_serializer(self.get_queryset(), many=True).data
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class IngredientViewSet(CatalogMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
     filter_backends = (IngredientFilter, )
     search_fields = ('^name', )
     pagination_class = None
+    catalog_name = 'ingredients'
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(IngredientFilter.search_param)
+        if name:
+            return Response(ingredient_index.search(name))
+        return super().list(request, *args, **kwargs)
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(CatalogMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    catalog_name = 'tags'
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, AnonymousCacheMixin,
+                    KeysetPaginationMixin, LeanListMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.select_related('author').prefetch_related(
         Prefetch(
             'tags',
             queryset=Tag.objects.all(),
         ),
         Prefetch(
-            'ingredients',
-            queryset=Ingredient.objects.all(),
+            'ingredienttorecipe',
+            queryset=IngredientRecipe.objects.select_related('ingredient'),
         )
     )
     serializer_class = CreateRecipeSerializer
@@ -52,34 +96,91 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['thumbnails'] = self.action in ('list', 'match', 'feed')
+        return context
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeReadSerializer
         return CreateRecipeSerializer
 
-    @staticmethod
-    def send_message(ingredients):
-        shopping_list = 'Купить в магазине:'
-        for ingredient in ingredients:
-            shopping_list += (
-                f'\n{ingredient["ingredient__name"]} '
-                f'({ingredient["ingredient__measurement_unit"]}) - '
-                f'{ingredient["amount"]}')
-        file_name = 'shopping_list.txt'
-        return FileResponse(
-            shopping_list,
-            content_type='text/plain',
-            as_attachment=True,
-            filename=file_name)
-
-    @action(detail=False, methods=['GET'])
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=[IsAuthenticated],
+        renderer_classes=(PlainTextShoppingListRenderer,
+                          CSVShoppingListRenderer,
+                          PDFShoppingListRenderer),
+    )
     def download_shopping_cart(self, request):
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__shopping_list__user=request.user
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
         ).order_by('ingredient__name').values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        return self.send_message(ingredients)
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        ).iterator()
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients), content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="{renderer.file_name}.{renderer.format}"')
+        return response
+
+    @action(detail=False, methods=('GET',))
+    def match(self, request):
+        ingredient_ids, max_missing = get_match_params(request)
+        matches = recipe_matcher.match(ingredient_ids, max_missing)
+        paginator = CustomPagination()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page])
+        results = []
+        for recipe_id, coverage, missing in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is not None:
+                recipe.coverage = round(coverage, 4)
+                recipe.missing = missing
+                results.append(recipe)
+        serializer = RecipeMatchSerializer(
+            results, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        paginator = FeedPagination()
+        recipe_ids = paginator.paginate_streams(
+            get_feed_streams(request.user), request)
+        recipes = {
+            row['id']: row for row in self.get_queryset().prefetch_related(
+                None).filter(pk__in=recipe_ids).values(
+                    *RecipeListLeanSerializer.fields)
+        }
+        serializer = RecipeListLeanSerializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
 
     @staticmethod
     def shoppingcart_and_favorite_relation(serializer, request, pk):
@@ -93,6 +194,33 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @staticmethod
+    def shoppingcart_and_favorite_batch(serializer, request):
+        serializer = serializer(
+            data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.save(user=request.user))
+
+    @action(
+        detail=False,
+        methods=('POST',),
+        url_path='shopping_cart/batch',
+        permission_classes=[IsAuthenticated])
+    def shopping_cart_batch(self, request):
+        return self.shoppingcart_and_favorite_batch(
+            ShoppingCartBatchSerializer, request
+        )
+
+    @action(
+        detail=False,
+        methods=('POST',),
+        url_path='favorite/batch',
+        permission_classes=[IsAuthenticated])
+    def favorite_batch(self, request):
+        return self.shoppingcart_and_favorite_batch(
+            FavoriteBatchSerializer, request
+        )
+
     @action(
         detail=True,
         methods=('POST',),
@@ -130,10 +258,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserViewSet(BaseUserViewSet):
+class UserViewSet(KeysetPaginationMixin, BaseUserViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = CustomPagination
+    keyset_pagination_class = UsernameKeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(is_subscribed=Value(False))
+        return queryset.annotate(is_subscribed=Exists(Follow.objects.filter(
+            user=user, author=OuterRef('pk'))))
 
     def get_permissions(self):
         if self.action == 'me':
@@ -166,10 +303,19 @@ class UserViewSet(BaseUserViewSet):
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        user = request.user
-        queryset = User.objects.filter(following__user=user)
+        queryset = User.objects.filter(
+            following__user=request.user
+        ).annotate(
+            is_subscribed=Value(True),
+        ).order_by('username')
         pages = self.paginate_queryset(queryset)
+        latest_recipes = get_latest_recipes(
+            [author.id for author in pages], get_recipes_limit(request)
+        )
         serializer = SubscribeListSerializer(
-            pages, many=True, context={'request': request}
+            pages, many=True, context={
+                'request': request,
+                'latest_recipes': latest_recipes,
+            }
         )
         return self.get_paginated_response(serializer.data)
@@ -8,3 +8,22 @@ HEX_LENGTH = 7
 MAX_PAGE = 6
 MAX_NAME = 150
 MAX_EMAIL = 254
+INGREDIENT_SEARCH_LIMIT = 50
+CATALOG_CACHE_TIMEOUT = 60
+IMAGE_MAX_SIZE = 15 * 1024 * 1024
+IMAGE_MAX_SIDE = 8000
+IMAGE_THUMBNAIL_SIZE = (480, 480)
+IMAGE_DETAIL_SIZE = (1200, 1200)
+IMAGE_QUALITY = 85
+MAX_PAGE_SIZE = 100
+SEARCH_CONFIG = 'russian'
+SEARCH_RESULTS_LIMIT = 500
+MATCH_MAX_INGREDIENTS = 100
+MATCHER_REBUILD_INTERVAL = 300
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_SIZE = 100
+FEED_POPULAR_CACHE_TIMEOUT = 300
+SCORE_FAVORITE_WEIGHT = 1.0
+SCORE_CART_WEIGHT = 2.0
+SCORE_PUBLISH_WEIGHT = 1.0
+TRENDING_HALF_LIFE_HOURS = 48
@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,6 +84,29 @@ else:
         }
     }
 
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', LOCAL_CACHE_BACKEND),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+# Локальный кэш не видит сброса из других процессов (выход,
+# правка рецепта), поэтому без общего бэкенда токены и ответы
+# кэшируются ненадолго.
+SHARED_CACHE_TIMEOUT = (
+    10 if CACHES['default']['BACKEND'] == LOCAL_CACHE_BACKEND else 300)
+CACHES['tokens'] = {
+    **CACHES['default'],
+    'KEY_PREFIX': 'tokens',
+    'TIMEOUT': int(os.getenv('TOKEN_CACHE_TIMEOUT', SHARED_CACHE_TIMEOUT)),
+}
+CACHES['responses'] = {
+    **CACHES['default'],
+    'KEY_PREFIX': 'responses',
+    'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', SHARED_CACHE_TIMEOUT)),
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -103,7 +128,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
 }
 
@@ -139,3 +164,16 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+REQUEST_METRICS = {
+    'SLOW_REQUEST_MS': int(os.getenv('SLOW_REQUEST_MS', 500)),
+    'MAX_QUERIES': int(os.getenv('SLOW_REQUEST_MAX_QUERIES', 30)),
+}
+
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', 2))
+
+IMAGE_PIPELINE_SYNC = os.getenv('IMAGE_PIPELINE_SYNC', 'False') == 'True'
+
+SHOPPING_LIST_FONT = os.getenv(
+    'SHOPPING_LIST_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
@@ -1,7 +1,16 @@
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.db import DatabaseError
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+try:
+    from api.ingredient_index import ingredient_index
+    from api.recipe_matcher import recipe_matcher
+    ingredient_index.build()
+    recipe_matcher.build()
+except DatabaseError:
+    pass
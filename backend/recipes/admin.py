@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Prefetch
 from django.utils.safestring import mark_safe
 
 from .models import (
@@ -9,6 +10,7 @@ from .models import (
     ShoppingCart,
     Tag
 )
+from .signals import recipe_changed
 
 
 class IngredientInline(admin.TabularInline):
@@ -16,6 +18,7 @@ class IngredientInline(admin.TabularInline):
     model = IngredientRecipe
     extra = 1
     min_num = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Recipe)
@@ -23,16 +26,28 @@ class RecipeAdmin(admin.ModelAdmin):
     """ Админ панель управление рецептами. """
     list_display = ('author', 'name', 'cooking_time',
                     'get_favorites', 'get_ingredients', 'display_image')
-    search_fields = ('name', 'author', 'tags')
-    list_filter = ('author', 'name', 'tags')
+    search_fields = ('name', 'author__username')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    autocomplete_fields = ('author', 'tags')
+    show_full_result_count = False
     inlines = (IngredientInline,)
 
-    @admin.display(description='Избранное')
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            Prefetch('ingredients', queryset=Ingredient.objects.only('name'))
+        )
+
+    @admin.display(description='Избранное', ordering='favorites_count')
     def get_favorites(self, obj):
         """ Вывод количества избранных рецептов. """
-        return obj.favorites.count()
+        return obj.favorites_count
     get_favorites.short_description = 'Избранное'
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipe_changed.send(sender=Recipe, instance=form.instance)
+
     @admin.display(description='Ингридиенты')
     def get_ingredients(self, obj):
         """ Вывод списка ингридиентов. """
@@ -44,9 +59,10 @@ class RecipeAdmin(admin.ModelAdmin):
     @admin.display(description="Изображение")
     def display_image(self, obj):
         """ Изображение рецепта. """
-        if obj.image:
+        image = obj.thumbnail or obj.image
+        if image:
             return mark_safe(
-                f'<img src="{obj.image.url}" width="80" height="60">')
+                f'<img src="{image.url}" width="80" height="60">')
         return None
 
 
@@ -54,8 +70,8 @@ class RecipeAdmin(admin.ModelAdmin):
 class IngredientAdmin(admin.ModelAdmin):
     """ Админ панель управление ингридиентами """
     list_display = ('name', 'measurement_unit')
-    search_fields = ('name', )
-    list_filter = ('name', )
+    search_fields = ('^name', )
+    show_full_result_count = False
     ordering = ('name', )
 
 
@@ -72,8 +88,10 @@ class TagAdmin(admin.ModelAdmin):
 class FavoriteAdmin(admin.ModelAdmin):
     """ Админ панель управление подписками """
     list_display = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
     ordering = ('-id',)
 
 
@@ -81,7 +99,9 @@ class FavoriteAdmin(admin.ModelAdmin):
 class ShoppingCartAdmin(admin.ModelAdmin):
     """ Админ панель списка покупок """
     list_display = ('recipe', 'user')
-    list_filter = ('recipe', 'user')
-    search_fields = ('user', )
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    show_full_result_count = False
     empty_value_display = '-пусто-'
     ordering = ('-id',)
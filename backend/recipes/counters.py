@@ -0,0 +1,30 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Follow, User
+from .models import Favorite, Recipe
+
+
+def change_counter(queryset, field, delta):
+    """ Атомарное изменение счётчика через F() без ухода в минус. """
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_all():
+    """ Пересчёт всех денормализованных счётчиков. """
+    Recipe.objects.update(favorites_count=count_related(Favorite, 'recipe'))
+    User.objects.update(
+        recipes_count=count_related(Recipe, 'author'),
+        followers_count=count_related(Follow, 'author'),
+    )
@@ -0,0 +1,131 @@
+from itertools import islice
+
+from django.core.cache import cache
+from django.db.models import F
+
+from common.constants import (FEED_BACKFILL_SIZE, FEED_FANOUT_LIMIT,
+                              FEED_POPULAR_CACHE_TIMEOUT)
+from users.models import Follow, User
+from .models import FeedEntry, Recipe
+
+POPULAR_AUTHORS_KEY = 'feed-popular-authors'
+FEED_BATCH_SIZE = 1000
+
+
+def get_popular_author_ids():
+    """
+    Авторы, чьи рецепты не раскладываются по лентам.
+
+    У них больше FEED_FANOUT_LIMIT подписчиков, их рецепты
+    подмешиваются в ленту при чтении.
+    """
+    author_ids = cache.get(POPULAR_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = frozenset(User.objects.filter(
+            followers_count__gt=FEED_FANOUT_LIMIT
+        ).values_list('pk', flat=True))
+        cache.set(
+            POPULAR_AUTHORS_KEY, author_ids, FEED_POPULAR_CACHE_TIMEOUT)
+    return author_ids
+
+
+def forget_popular_authors():
+    cache.delete(POPULAR_AUTHORS_KEY)
+
+
+def get_followers_count(author_id):
+    return User.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True).first() or 0
+
+
+def create_entries(entries):
+    entries = iter(entries)
+    while batch := list(islice(entries, FEED_BATCH_SIZE)):
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_recipe(recipe):
+    """ Запись нового рецепта в ленты подписчиков автора. """
+    if get_followers_count(recipe.author_id) > FEED_FANOUT_LIMIT:
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=recipe.author_id).values_list('user_id', flat=True)
+    create_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe.pk,
+                  author_id=recipe.author_id, pub_date=recipe.pub_date)
+        for user_id in follower_ids.iterator()
+    )
+
+
+def get_latest_author_recipes(author_id):
+    return Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', 'pub_date')[:FEED_BACKFILL_SIZE]
+
+
+def backfill_feed(user_id, author_id):
+    """ Последние рецепты автора в ленту нового подписчика. """
+    create_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                  author_id=author_id, pub_date=pub_date)
+        for recipe_id, pub_date in get_latest_author_recipes(author_id)
+    )
+
+
+def backfill_followers(author_id):
+    """
+    Последние рецепты автора в ленты всех подписчиков.
+
+    Нужна, когда автор опускается до FEED_FANOUT_LIMIT подписчиков
+    и его рецепты перестают подмешиваться при чтении.
+    """
+    recipes = list(get_latest_author_recipes(author_id))
+    follower_ids = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    create_entries(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                  author_id=author_id, pub_date=pub_date)
+        for user_id in follower_ids.iterator()
+        for recipe_id, pub_date in recipes
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild_feeds(user_ids=None):
+    """ Пересборка лент по подпискам; без user_ids — всех лент. """
+    entries = FeedEntry.objects.all()
+    follows = Follow.objects.exclude(
+        author__followers_count__gt=FEED_FANOUT_LIMIT)
+    if user_ids is not None:
+        entries = entries.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    entries.delete()
+    for user_id, author_id in follows.values_list(
+            'user_id', 'author_id').iterator():
+        backfill_feed(user_id, author_id)
+    forget_popular_authors()
+
+
+def get_feed_streams(user):
+    """
+    Выборки ленты, каждая отсортирована по (pub_date, recipe_id).
+
+    Первая — разложенные записи ленты, вторая — рецепты популярных
+    авторов из подписок пользователя.
+    """
+    streams = [
+        FeedEntry.objects.filter(user=user).values('pub_date', 'recipe_id')
+    ]
+    popular_ids = get_popular_author_ids()
+    if popular_ids:
+        followed_ids = list(Follow.objects.filter(
+            user=user, author_id__in=popular_ids
+        ).values_list('author_id', flat=True))
+        if followed_ids:
+            streams.append(Recipe.objects.filter(
+                author_id__in=followed_ids
+            ).values('pub_date', recipe_id=F('pk')))
+    return streams
@@ -0,0 +1,115 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from common.constants import (IMAGE_DETAIL_SIZE, IMAGE_QUALITY,
+                              IMAGE_THUMBNAIL_SIZE)
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = 'recipes/image/'
+DETAIL_SUFFIX = '_detail'
+IMAGE_VARIANTS = (
+    ('image', DETAIL_SUFFIX, IMAGE_DETAIL_SIZE, 'JPEG', 'jpg'),
+    ('thumbnail', '_card', IMAGE_THUMBNAIL_SIZE, 'JPEG', 'jpg'),
+    ('image_webp', '_detail', IMAGE_DETAIL_SIZE, 'WEBP', 'webp'),
+)
+
+_executor = None
+
+image_processed = Signal()
+""" Поля изображений рецепта заменены обработанными версиями. """
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PIPELINE_WORKERS,
+            thread_name_prefix='recipe-images',
+        )
+    return _executor
+
+
+def is_processed(recipe):
+    """ Изображение уже заменено обработанной версией. """
+    return recipe.image.name.rsplit('.', 1)[0].endswith(DETAIL_SUFFIX)
+
+
+def schedule_image_processing(recipe):
+    """ Постановка обработки изображения в пул после коммита. """
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    if settings.IMAGE_PIPELINE_SYNC:
+        transaction.on_commit(
+            lambda: process_recipe_image(recipe_id, image_name))
+        return
+    transaction.on_commit(lambda: get_executor().submit(
+        run_in_worker, recipe_id, image_name))
+
+
+def run_in_worker(recipe_id, image_name):
+    try:
+        process_recipe_image(recipe_id, image_name)
+    except Exception:
+        logger.exception(
+            'Не удалось обработать изображение рецепта %s', recipe_id)
+    finally:
+        connection.close()
+
+
+def render_variant(source, size, image_format):
+    """ Уменьшенная копия без метаданных. """
+    variant = source.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, image_format, quality=IMAGE_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def save_variant(content, suffix, extension):
+    """ Сохранение файла с именем по хэшу содержимого. """
+    name = (f'{UPLOAD_DIR}{sha256(content).hexdigest()[:32]}'
+            f'{suffix}.{extension}')
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(content))
+    return name
+
+
+def process_recipe_image(recipe_id, image_name):
+    """
+    Обработка загруженного изображения рецепта.
+
+    Из оригинала делаются версии для карточки, детальной страницы
+    и WebP; метаданные (EXIF) при пересохранении отбрасываются.
+    Поля обновляются, только если изображение не сменилось за
+    время обработки, после чего оригинал удаляется.
+    """
+    with default_storage.open(image_name) as image_file:
+        source = ImageOps.exif_transpose(Image.open(image_file))
+        if source.mode != 'RGB':
+            background = Image.new('RGB', source.size, 'white')
+            rgba = source.convert('RGBA')
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            source = background
+        variants = {
+            field: save_variant(
+                render_variant(source, size, image_format), suffix, extension)
+            for field, suffix, size, image_format, extension in IMAGE_VARIANTS
+        }
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=image_name
+    ).update(**variants, updated_at=timezone.now())
+    if updated:
+        image_processed.send(sender=Recipe, recipe_id=recipe_id)
+    if updated and image_name != variants['image']:
+        default_storage.delete(image_name)
@@ -1,41 +1,139 @@
+import csv
 import json
+import os
+from itertools import islice
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
+from api.cache import catalog_version
 from recipes.models import Ingredient, Tag
 
+DATA_DIR = os.path.join(settings.BASE_DIR, 'data')
+READ_CHUNK_SIZE = 64 * 1024
 
-class Command(BaseCommand):
-    ''' Загрузка данных из JSON-файла '''
 
-    def handle(self, *args, **options):
-        self.stdout.write(self.style.WARNING('Загружаем ингридиенты!'))
-        ingredients_file_path = 'data/ingredients.json'
+def iter_json_array(data_file):
+    """ Потоковое чтение объектов JSON-массива без загрузки файла. """
+    decoder = json.JSONDecoder()
+    buffer = data_file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise json.JSONDecodeError('Ожидался JSON-массив', buffer, 0)
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
         try:
-            with open(ingredients_file_path,
-                      encoding='utf-8') as data_file_ingredients:
-                ingredient_data = json.load(data_file_ingredients)
-                for ingredients in ingredient_data:
-                    Ingredient.objects.get_or_create(**ingredients)
-        except FileNotFoundError:
-            self.stdout.write(
-                self.style.ERROR('Файл с ингредиентами не найден!'))
+            item, end = decoder.raw_decode(buffer)
         except json.JSONDecodeError:
-            self.stdout.write(
-                self.style.ERROR(
-                    'Ошибка при чтении JSON файла с ингредиентами!'))
+            chunk = data_file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_rows(path):
+    """ Строки файла данных в формате JSON или CSV. """
+    with open(path, encoding='utf-8', newline='') as data_file:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(data_file)
+        else:
+            yield from iter_json_array(data_file)
+
+
+def iter_batches(rows, batch_size):
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        yield batch
+
 
-        self.stdout.write(self.style.WARNING('Загружаем тэги!'))
-        tags_file_path = 'data/tags.json'
+class Command(BaseCommand):
+    ''' Загрузка ингредиентов и тегов из JSON- или CSV-файла '''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(DATA_DIR, 'ingredients.json'),
+            help='Файл с ингредиентами (.json или .csv)',
+        )
+        parser.add_argument(
+            '--tags-path',
+            default=os.path.join(DATA_DIR, 'tags.json'),
+            help='Файл с тегами (.json или .csv)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Посчитать новые записи без записи в базу',
+        )
+
+    def import_rows(self, model, rows, batch_size, dry_run):
+        """
+        Пакетная загрузка через bulk_create(ignore_conflicts=True).
+
+        Дубликаты отбрасываются уникальными ограничениями модели,
+        поэтому повторный запуск ничего не меняет. Возвращает
+        количество добавленных и пропущенных записей.
+        """
+        total = inserted = 0
+        count_before = model.objects.count()
+        for batch in iter_batches(rows, batch_size):
+            total += len(batch)
+            objects = [model(**row) for row in batch]
+            if dry_run:
+                inserted += len(self.filter_new(model, objects))
+            else:
+                model.objects.bulk_create(objects, ignore_conflicts=True)
+        if not dry_run:
+            inserted = model.objects.count() - count_before
+        return inserted, total - inserted
+
+    @staticmethod
+    def filter_new(model, objects):
+        if model is Ingredient:
+            existing = set(Ingredient.objects.filter(
+                name__in=[ingredient.name for ingredient in objects]
+            ).values_list('name', 'measurement_unit'))
+            return {
+                (ingredient.name, ingredient.measurement_unit)
+                for ingredient in objects
+            } - existing
+        existing = set(Tag.objects.filter(
+            slug__in=[tag.slug for tag in objects]
+        ).values_list('slug', flat=True))
+        return {tag.slug for tag in objects} - existing
+
+    def load(self, model, path, options, title):
+        self.stdout.write(self.style.WARNING(f'Загружаем {title}!'))
         try:
-            with open(tags_file_path, encoding='utf-8') as data_file_tags:
-                tags_data = json.load(data_file_tags)
-                for tags in tags_data:
-                    Tag.objects.get_or_create(**tags)
+            inserted, skipped = self.import_rows(
+                model, iter_rows(path),
+                options['batch_size'], options['dry_run'])
         except FileNotFoundError:
-            self.stdout.write(self.style.ERROR('Файл с тегами не найден!'))
-        except json.JSONDecodeError:
+            self.stdout.write(self.style.ERROR(f'Файл {path} не найден!'))
+            return 0
+        except (json.JSONDecodeError, csv.Error, TypeError) as error:
             self.stdout.write(
-                self.style.ERROR('Ошибка при чтении JSON файла с тегами!'))
+                self.style.ERROR(f'Ошибка при чтении файла {path}: {error}'))
+            return 0
+        self.stdout.write(
+            f'Добавлено: {inserted}, пропущено: {skipped}')
+        return inserted
 
+    def handle(self, *args, **options):
+        inserted = self.load(
+            Ingredient, options['path'], options, 'ингридиенты')
+        inserted += self.load(
+            Tag, options['tags_path'], options, 'тэги')
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.SUCCESS('Пробный запуск, база не изменена.'))
+            return
+        if inserted:
+            catalog_version.bump()
         self.stdout.write(self.style.SUCCESS('Отлично загрузили!'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import is_processed, process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    ''' Подготовка уменьшенных версий изображений старых рецептов '''
+
+    def handle(self, *args, **options):
+        processed = 0
+        for recipe in Recipe.objects.only('id', 'image').iterator():
+            if not recipe.image or is_processed(recipe):
+                continue
+            try:
+                process_recipe_image(recipe.pk, recipe.image.name)
+            except (OSError, ValueError) as error:
+                self.stdout.write(self.style.ERROR(
+                    f'Рецепт {recipe.pk}: {error}'))
+                continue
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {processed}'))
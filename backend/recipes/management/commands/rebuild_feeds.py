@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    ''' Пересборка лент подписок '''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя; без параметра — все пользователи')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_feeds(options['users'])
+        self.stdout.write(self.style.SUCCESS('Ленты подписок пересобраны!'))
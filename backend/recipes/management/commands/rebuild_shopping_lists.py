@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    ''' Пересборка списков покупок из корзины '''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='users',
+            help='id пользователя; без параметра — все пользователи')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_shopping_lists(options['users'])
+        self.stdout.write(self.style.SUCCESS('Списки покупок пересобраны!'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import RecipeScore
+from recipes.scores import create_missing_scores, update_dirty_scores
+
+
+class Command(BaseCommand):
+    ''' Пересчёт рейтингов popular и trending '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать все рецепты, а не только изменившиеся')
+
+    def handle(self, *args, **options):
+        create_missing_scores()
+        if options['all']:
+            RecipeScore.objects.update(dirty=True)
+        updated = update_dirty_scores(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рейтингов: {updated}'))
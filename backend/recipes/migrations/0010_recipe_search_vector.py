@@ -0,0 +1,80 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:55
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+POSTGRESQL_FORWARDS = (
+    'CREATE INDEX recipe_search_vector_idx ON recipes_recipe '
+    'USING gin (search_vector)',
+    'CREATE INDEX recipe_name_trgm_idx ON recipes_recipe '
+    'USING gin (name gin_trgm_ops)',
+    '''
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('russian', recipe.name), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian', recipe.text), 'C')
+    ''',
+)
+POSTGRESQL_BACKWARDS = (
+    'DROP INDEX IF EXISTS recipe_name_trgm_idx',
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+)
+SQLITE_FORWARDS = (
+    'CREATE VIRTUAL TABLE recipes_recipe_search '
+    'USING fts5(name, ingredients, text)',
+    '''
+    INSERT INTO recipes_recipe_search (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_ingredientrecipe AS link
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = link.ingredient_id
+        WHERE link.recipe_id = recipe.id
+    ), ''), recipe.text
+    FROM recipes_recipe AS recipe
+    ''',
+)
+SQLITE_BACKWARDS = (
+    'DROP TABLE IF EXISTS recipes_recipe_search',
+)
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor)
+        for statement in vendor_statements or ():
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_favorites_count'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_statements({
+                'postgresql': POSTGRESQL_FORWARDS,
+                'sqlite': SQLITE_FORWARDS,
+            }),
+            run_statements({
+                'postgresql': POSTGRESQL_BACKWARDS,
+                'sqlite': SQLITE_BACKWARDS,
+            }),
+        ),
+    ]
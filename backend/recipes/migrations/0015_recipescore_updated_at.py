@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_scores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipescore',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата пересчёта'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import UniqueConstraint
@@ -89,6 +90,18 @@ class Recipe(models.Model):
         upload_to='recipes/image/',
         verbose_name='Изображение'
     )
+    thumbnail = models.ImageField(
+        upload_to='recipes/image/',
+        verbose_name='Миниатюра',
+        blank=True,
+        editable=False
+    )
+    image_webp = models.ImageField(
+        upload_to='recipes/image/',
+        verbose_name='Изображение WebP',
+        blank=True,
+        editable=False
+    )
     text = models.TextField(verbose_name='Описание')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -113,9 +126,30 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False
+    )
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -136,6 +170,10 @@ class UserRecipe(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
     )
+    created = models.DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True
+    )
 
     class Meta:
         abstract = True
@@ -196,9 +234,134 @@ class IngredientRecipe(models.Model):
         ordering = ('-id', )
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты рецепта'
+        constraints = [
+            UniqueConstraint(
+                fields=('ingredient', 'recipe'),
+                name='unique_ingredient_recipe'
+            )
+        ]
 
     def __str__(self):
         return (
             f'{self.ingredient.name} :: {self.ingredient.measurement_unit}'
             f' - {self.amount} '
         )
+
+
+class ShoppingListItem(models.Model):
+    """ Сумма ингредиента в списке покупок пользователя. """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='shopping_list_items'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Строки списка покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_user_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} :: {self.ingredient} - {self.amount}'
+
+
+class FeedEntry(models.Model):
+    """ Рецепт в ленте подписок пользователя. """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Подписчик',
+        related_name='feed_entries'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='+'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор',
+        related_name='+'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_user_recipe'
+            )
+        ]
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user} :: {self.recipe}'
+
+
+class RecipeScore(models.Model):
+    """ Рейтинг рецепта по избранному и спискам покупок. """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Рецепт',
+        related_name='score'
+    )
+    popular = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+        db_index=True
+    )
+    trending = models.FloatField(
+        verbose_name='Тренд',
+        default=0,
+        db_index=True
+    )
+    dirty = models.BooleanField(
+        verbose_name='Требует пересчёта',
+        default=True
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата пересчёта',
+        auto_now=True,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(
+                fields=('recipe',),
+                condition=models.Q(dirty=True),
+                name='recipe_score_dirty_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} :: {self.popular:g} / {self.trending:g}'
@@ -0,0 +1,103 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from math import exp, log
+
+from django.dispatch import Signal
+
+from common.constants import (SCORE_CART_WEIGHT, SCORE_FAVORITE_WEIGHT,
+                              SCORE_PUBLISH_WEIGHT, TRENDING_HALF_LIFE_HOURS)
+from .models import Favorite, Recipe, RecipeScore, ShoppingCart
+
+SCORE_EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+DECAY_SECONDS = TRENDING_HALF_LIFE_HOURS * 3600 / log(2)
+scores_updated = Signal()
+SCORE_EVENTS = (
+    (Favorite, SCORE_FAVORITE_WEIGHT),
+    (ShoppingCart, SCORE_CART_WEIGHT),
+)
+
+
+def get_event_exponent(moment, weight):
+    """ Логарифм вклада события с весом weight в момент moment. """
+    return log(weight) + (moment - SCORE_EPOCH).total_seconds() / DECAY_SECONDS
+
+
+def log_sum_exp(exponents):
+    top = max(exponents)
+    return top + log(sum(exp(value - top) for value in exponents))
+
+
+def compute_scores(recipe_ids):
+    """
+    Рейтинги рецептов: popular и trending.
+
+    popular — взвешенная сумма добавлений в избранное и в списки
+    покупок. trending — та же сумма с экспоненциальным затуханием,
+    хранимая в логарифмической шкале относительно SCORE_EPOCH:
+    log Σ w·e^((t − epoch)/τ). Сравнение таких значений в любой
+    момент равносильно сравнению затухших сумм, поэтому со временем
+    их не нужно пересчитывать. Публикация считается событием с
+    весом SCORE_PUBLISH_WEIGHT, чтобы у новых рецептов был тренд.
+    """
+    popular = defaultdict(float)
+    exponents = defaultdict(list)
+    for recipe_id, pub_date in Recipe.objects.filter(
+            pk__in=recipe_ids).values_list('pk', 'pub_date'):
+        exponents[recipe_id].append(
+            get_event_exponent(pub_date, SCORE_PUBLISH_WEIGHT))
+    for model, weight in SCORE_EVENTS:
+        for recipe_id, created in model.objects.filter(
+                recipe_id__in=recipe_ids).values_list('recipe_id', 'created'):
+            popular[recipe_id] += weight
+            exponents[recipe_id].append(get_event_exponent(created, weight))
+    return {
+        recipe_id: (popular[recipe_id], log_sum_exp(values))
+        for recipe_id, values in exponents.items()
+    }
+
+
+def create_missing_scores():
+    missing = Recipe.objects.filter(
+        score__isnull=True).values_list('pk', flat=True)
+    RecipeScore.objects.bulk_create(
+        (RecipeScore(recipe_id=recipe_id)
+         for recipe_id in missing.iterator()),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def mark_scores_dirty(recipe_ids):
+    RecipeScore.objects.filter(
+        recipe_id__in=recipe_ids, dirty=False).update(dirty=True)
+
+
+def update_dirty_scores(batch_size):
+    """
+    Пересчёт рейтингов, помеченных к обновлению, пакетами.
+
+    Флаг снимается до чтения событий: событие, пришедшее во время
+    пересчёта, снова пометит рецепт. Пересчитанным рейтингам
+    ставится updated_at: по его максимуму веб-процессы узнают
+    о пересчёте. После пересчёта отправляется scores_updated.
+    Возвращает число рецептов.
+    """
+    updated = 0
+    while True:
+        recipe_ids = list(RecipeScore.objects.filter(
+            dirty=True).values_list('recipe_id', flat=True)[:batch_size])
+        if not recipe_ids:
+            if updated:
+                scores_updated.send(sender=RecipeScore, updated=updated)
+            return updated
+        RecipeScore.objects.filter(recipe_id__in=recipe_ids).update(
+            dirty=False)
+        scores = compute_scores(recipe_ids)
+        now = datetime.now(timezone.utc)
+        RecipeScore.objects.bulk_update(
+            [RecipeScore(recipe_id=recipe_id, popular=popular,
+                         trending=trending, updated_at=now)
+             for recipe_id, (popular, trending) in scores.items()],
+            ['popular', 'trending', 'updated_at'],
+        )
+        updated += len(recipe_ids)
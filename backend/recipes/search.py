@@ -0,0 +1,115 @@
+import re
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from common.constants import SEARCH_CONFIG, SEARCH_RESULTS_LIMIT
+
+FTS_TABLE = 'recipes_recipe_search'
+
+POSTGRESQL_UPDATE_SQL = f'''
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', recipe.name), 'A')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientrecipe AS link
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = link.ingredient_id
+            WHERE link.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', recipe.text), 'C')
+    WHERE recipe.id IN ({{placeholders}})
+'''
+SQLITE_DELETE_SQL = (
+    f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({{placeholders}})')
+SQLITE_INSERT_SQL = f'''
+    INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_ingredientrecipe AS link
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = link.ingredient_id
+        WHERE link.recipe_id = recipe.id
+    ), ''), recipe.text
+    FROM recipes_recipe AS recipe
+    WHERE recipe.id IN ({{placeholders}})
+'''
+SQLITE_SEARCH_SQL = f'''
+    SELECT rowid FROM {FTS_TABLE}
+    WHERE {FTS_TABLE} MATCH %s
+    ORDER BY bm25({FTS_TABLE}, 10.0, 5.0, 1.0)
+    LIMIT %s
+'''
+
+
+def update_search_index(recipe_ids):
+    """
+    Обновление поискового индекса по названию, ингредиентам и
+    описанию рецептов.
+
+    На PostgreSQL пересчитывается столбец search_vector, на SQLite
+    перезаписываются строки таблицы FTS5.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                POSTGRESQL_UPDATE_SQL.format(placeholders=placeholders),
+                recipe_ids)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                SQLITE_DELETE_SQL.format(placeholders=placeholders),
+                recipe_ids)
+            cursor.execute(
+                SQLITE_INSERT_SQL.format(placeholders=placeholders),
+                recipe_ids)
+
+
+def remove_from_search_index(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SQLITE_DELETE_SQL.format(placeholders='%s'), [recipe_id])
+
+
+def search_recipes(queryset, query):
+    """
+    Рецепты, подходящие под запрос, в порядке релевантности.
+
+    На всех базах в выдачу попадают не более SEARCH_RESULTS_LIMIT
+    лучших совпадений среди всех рецептов; остальные фильтры
+    применяются к ним.
+    """
+    recipes = queryset.model.objects
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                                    TrigramSimilarity)
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch')
+        rank = (SearchRank(F('search_vector'), search_query)
+                + TrigramSimilarity('name', query))
+        best = recipes.filter(
+            Q(search_vector=search_query) | Q(name__trigram_similar=query)
+        ).annotate(rank=rank).order_by(
+            '-rank', '-pub_date', '-id').values('pk')[:SEARCH_RESULTS_LIMIT]
+        return queryset.filter(pk__in=best).annotate(rank=rank).order_by(
+            '-rank', '-pub_date', '-id')
+    if connection.vendor == 'sqlite':
+        words = re.findall(r'\w+', query.lower())
+        if not words:
+            return queryset
+        match = ' '.join(f'"{word}"*' for word in words)
+        with connection.cursor() as cursor:
+            cursor.execute(SQLITE_SEARCH_SQL, [match, SEARCH_RESULTS_LIMIT])
+            recipe_ids = [row[0] for row in cursor.fetchall()]
+        return queryset.filter(pk__in=recipe_ids).order_by(Case(
+            *[When(pk=pk, then=Value(position))
+              for position, pk in enumerate(recipe_ids)],
+            output_field=IntegerField(),
+        ))
+    return queryset.filter(pk__in=recipes.filter(
+        Q(name__icontains=query) | Q(text__icontains=query)
+    ).order_by('-pub_date', '-id').values('pk')[:SEARCH_RESULTS_LIMIT])
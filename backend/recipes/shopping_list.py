@@ -0,0 +1,79 @@
+from django.db import connection
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Greatest
+
+from .models import IngredientRecipe, ShoppingCart, ShoppingListItem
+
+ADD_SQL = '''
+    INSERT INTO recipes_shoppinglistitem (user_id, ingredient_id, amount)
+    SELECT %s, link.ingredient_id, SUM(link.amount)
+    FROM recipes_ingredientrecipe AS link
+    WHERE link.recipe_id IN ({placeholders})
+    GROUP BY link.ingredient_id
+    ON CONFLICT (user_id, ingredient_id) DO UPDATE
+    SET amount = recipes_shoppinglistitem.amount + excluded.amount
+'''
+REBUILD_SQL = '''
+    INSERT INTO recipes_shoppinglistitem (user_id, ingredient_id, amount)
+    SELECT cart.user_id, link.ingredient_id, SUM(link.amount)
+    FROM recipes_shoppingcart AS cart
+    JOIN recipes_ingredientrecipe AS link ON link.recipe_id = cart.recipe_id
+    WHERE {condition}
+    GROUP BY cart.user_id, link.ingredient_id
+'''
+
+
+def add_to_shopping_list(user_id, recipe_ids):
+    """ Прибавление ингредиентов рецептов к списку покупок одним UPSERT. """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            ADD_SQL.format(placeholders=placeholders),
+            [user_id, *recipe_ids])
+
+
+def remove_from_shopping_list(user_id, recipe_ids):
+    """ Вычитание ингредиентов рецептов и удаление обнулившихся строк. """
+    links = IngredientRecipe.objects.filter(recipe_id__in=recipe_ids)
+    items = ShoppingListItem.objects.filter(
+        user_id=user_id,
+        ingredient_id__in=links.values('ingredient_id'),
+    )
+    items.update(amount=Greatest(F('amount') - Subquery(
+        links.filter(
+            ingredient_id=OuterRef('ingredient_id')
+        ).order_by().values('ingredient_id').annotate(
+            total=Sum('amount')).values('total'),
+        output_field=IntegerField(),
+    ), 0))
+    items.filter(amount=0).delete()
+
+
+def rebuild_shopping_lists(user_ids=None):
+    """
+    Пересборка списков покупок из корзины.
+
+    Без user_ids пересобираются списки всех пользователей.
+    """
+    items = ShoppingListItem.objects.all()
+    condition, params = '1 = 1', []
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        items = items.filter(user_id__in=user_ids)
+        condition = 'cart.user_id IN ({})'.format(
+            ', '.join(['%s'] * len(user_ids)))
+        params = user_ids
+    items.delete()
+    with connection.cursor() as cursor:
+        cursor.execute(REBUILD_SQL.format(condition=condition), params)
+
+
+def rebuild_recipe_shopping_lists(recipe_id):
+    """ Пересборка списков у пользователей с рецептом в корзине. """
+    rebuild_shopping_lists(ShoppingCart.objects.filter(
+        recipe_id=recipe_id).values_list('user_id', flat=True))
@@ -0,0 +1,203 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from users.models import Follow, User
+from common.constants import FEED_FANOUT_LIMIT, SCORE_PUBLISH_WEIGHT
+from .counters import change_counter
+from .feed import (backfill_feed, backfill_followers, fan_out_recipe,
+                   forget_popular_authors, get_followers_count,
+                   remove_author_from_feed)
+from .images import is_processed, schedule_image_processing
+from .models import (Favorite, Ingredient, Recipe, RecipeScore,
+                     ShoppingCart, Tag)
+from .scores import get_event_exponent, mark_scores_dirty
+from .search import remove_from_search_index, update_search_index
+from .shopping_list import (add_to_shopping_list,
+                            rebuild_recipe_shopping_lists,
+                            remove_from_shopping_list)
+
+recipe_changed = Signal()
+""" Рецепт сохранён вместе с тегами и ингредиентами. """
+relations_created = Signal()
+""" Рецепты добавлены в избранное или корзину через bulk_create. """
+relations_deleted = Signal()
+""" Рецепты убраны из избранного или корзины одним DELETE. """
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, **kwargs):
+    if instance.image and not is_processed(instance):
+        schedule_image_processing(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe.objects.filter(pk=instance.recipe_id),
+            'favorites_count', 1)
+
+
+@receiver(relations_created, sender=Favorite)
+def increment_favorites_count_bulk(sender, recipe_ids, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk__in=recipe_ids), 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.recipe_id), 'favorites_count', -1)
+
+
+@receiver(relations_deleted, sender=Favorite)
+def decrement_favorites_count_bulk(sender, recipe_ids, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk__in=recipe_ids), 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def increment_followers_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_followers_count(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'followers_count', -1)
+
+
+@receiver(recipe_changed, sender=Recipe)
+def reindex_recipe(sender, instance, **kwargs):
+    update_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    remove_from_search_index(instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    if not created:
+        update_search_index(
+            Recipe.objects.filter(ingredients=instance)
+            .values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_cart_recipe_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        add_to_shopping_list(instance.user_id, [instance.recipe_id])
+
+
+@receiver(relations_created, sender=ShoppingCart)
+def add_cart_recipes_to_shopping_list(sender, user, recipe_ids, **kwargs):
+    add_to_shopping_list(user.pk, recipe_ids)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_cart_recipe_from_shopping_list(sender, instance, **kwargs):
+    remove_from_shopping_list(instance.user_id, [instance.recipe_id])
+
+
+@receiver(relations_deleted, sender=ShoppingCart)
+def remove_cart_recipes_from_shopping_list(sender, user, recipe_ids,
+                                           **kwargs):
+    remove_from_shopping_list(user.pk, recipe_ids)
+
+
+@receiver(recipe_changed, sender=Recipe)
+def rebuild_cart_shopping_lists(sender, instance, **kwargs):
+    rebuild_recipe_shopping_lists(instance.pk)
+
+
+def touch_recipes(queryset):
+    """ Отметка изменения рецептов без вызова сигналов сохранения. """
+    queryset.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=User)
+def touch_author_recipes(sender, instance, created, update_fields, **kwargs):
+    if created or (
+            update_fields is not None
+            and set(update_fields) <= {'last_login'}):
+        return
+    touch_recipes(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=Tag)
+def touch_tag_recipes(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_ingredient_recipes(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Follow)
+def add_author_to_feed(sender, instance, created, **kwargs):
+    if not created:
+        return
+    followers_count = get_followers_count(instance.author_id)
+    if followers_count == FEED_FANOUT_LIMIT + 1:
+        forget_popular_authors()
+    if followers_count <= FEED_FANOUT_LIMIT:
+        backfill_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_author_from_user_feed(sender, instance, **kwargs):
+    remove_author_from_feed(instance.user_id, instance.author_id)
+    if get_followers_count(instance.author_id) == FEED_FANOUT_LIMIT:
+        forget_popular_authors()
+        backfill_followers(instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, **kwargs):
+    if created:
+        RecipeScore.objects.create(
+            recipe=instance,
+            trending=get_event_exponent(
+                instance.pub_date, SCORE_PUBLISH_WEIGHT),
+            dirty=False,
+        )
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def mark_recipe_score_dirty(sender, instance, **kwargs):
+    if kwargs.get('created', True):
+        mark_scores_dirty([instance.recipe_id])
+
+
+@receiver((relations_created, relations_deleted), sender=Favorite)
+@receiver((relations_created, relations_deleted), sender=ShoppingCart)
+def mark_recipe_scores_dirty(sender, recipe_ids, **kwargs):
+    mark_scores_dirty(recipe_ids)
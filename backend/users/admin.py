@@ -13,23 +13,28 @@ class UserAdmin(BaseUserAdmin):
                     'recipe_count',
                     'follower_count')
     search_fields = ('username', 'email')
-    list_filter = ('first_name', 'last_name')
+    list_filter = ('is_staff', 'is_active')
+    show_full_result_count = False
     ordering = ('username',)
     empty_value_display = '-пусто-'
 
     def recipe_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
     recipe_count.short_description = 'Количество рецептов'
+    recipe_count.admin_order_field = 'recipes_count'
 
     def follower_count(self, obj):
-        return obj.following.count()
+        return obj.followers_count
     follower_count.short_description = 'Количество подписчиков'
+    follower_count.admin_order_field = 'followers_count'
 
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author',)
-    search_fields = ('user__username', 'author__username')
-    list_filter = ('user__username', 'author__username')
+    search_fields = ('^user__username', '^author__username')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    show_full_result_count = False
     ordering = ('-id',)
     empty_value_display = '-пусто-'
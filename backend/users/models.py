@@ -25,6 +25,16 @@ class User(AbstractUser):
         unique=True,
         validators=(UnicodeUsernameValidator(), )
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('username', )